@@ -1,59 +1,185 @@
 # app/config.py
 
 import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
 from dotenv import load_dotenv
-import anyio
-
-# Установите лимиты для anyio
-anyio.to_thread.current_default_thread_limiter().total_tokens = 50
-
-load_dotenv()
-
-APP_VERSION = os.getenv("APP_VERSION", "0.41.0")
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL")
-OLLAMA_API_URL = os.getenv("OLLAMA_API_URL")
-OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
-KIMI_API_URL = os.getenv("KIMI_API_URL")
-KIMI_API_KEY = os.getenv("KIMI_API_KEY")
-
-CONFLUENCE_API_TOKEN = os.getenv("CONFLUENCE_API_TOKEN")
-CONFLUENCE_USER = os.getenv("CONFLUENCE_USER")
-CONFLUENCE_BASE_URL = os.getenv("CONFLUENCE_BASE_URL")
-CONFLUENCE_PASSWORD = os.getenv("CONFLUENCE_PASSWORD")
-
-# ДОБАВЛЯЕМ конфигурацию JIRA
-JIRA_BASE_URL = os.getenv("JIRA_BASE_URL", "https://jira.gboteam.ru")
-JIRA_USER = os.getenv("JIRA_USER")
-JIRA_PASSWORD = os.getenv("JIRA_PASSWORD")
-JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")  # Альтернатива паролю
-
-LLM_PROVIDER = os.getenv("LLM_PROVIDER")
-LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4") # gpt-3.5-turbo, gpt-3.5-turbo-16k, gpt-4-32k...
-LLM_TEMPERATURE = os.getenv("LLM_TEMPERATURE", "0.2")
+
+
+# .env читается один раз на процесс. Модуль перезагружается через importlib.reload
+# (см. /config), который выполняет его заново в том же пространстве имен, поэтому
+# признак в глобальной переменной модуля переживает перезагрузку.
+# Уже заданные переменные окружения не перезаписываются
+if not globals().get("_DOTENV_LOADED"):
+    load_dotenv(override=False)
+    _DOTENV_LOADED = True
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Параметры сервиса из переменных окружения, разобранные один раз"""
+    APP_VERSION: str
+    GIT_COMMIT_SHA: str
+
+    OPENAI_API_KEY: Optional[str]
+    ANTHROPIC_API_KEY: Optional[str]
+    DEEPSEEK_API_KEY: Optional[str]
+    DEEPSEEK_API_URL: Optional[str]
+    OLLAMA_API_URL: Optional[str]
+    OLLAMA_API_KEY: Optional[str]
+    KIMI_API_URL: Optional[str]
+    KIMI_API_KEY: Optional[str]
+
+    CONFLUENCE_API_TOKEN: Optional[str]
+    CONFLUENCE_USER: Optional[str]
+    CONFLUENCE_BASE_URL: Optional[str]
+    CONFLUENCE_PASSWORD: Optional[str]
+    CONFLUENCE_MAX_CONCURRENCY: int
+
+    ANYIO_THREAD_TOKENS: int
+
+    JIRA_BASE_URL: str
+    JIRA_USER: Optional[str]
+    JIRA_PASSWORD: Optional[str]
+    JIRA_API_TOKEN: Optional[str]
+
+    LLM_PROVIDER: Optional[str]
+    LLM_MODEL: str
+    LLM_TEMPERATURE: str
+
+    EMBEDDING_PROVIDER: str
+    EMBEDDING_MODEL: str
+
+    CHROMA_PERSIST_DIR: str
+
+    PAGE_ANALYSIS_PROMPT_FILE: str
+    TEMPLATE_ANALYSIS_PROMPT_FILE: str
+
+    SERVICES_REGISTRY_FILE: str
+    TEMPLATES_REGISTRY_FILE: str
+
+    PAGE_CACHE_TTL: int
+    PAGE_CACHE_SIZE: int
+    PROCESSED_CACHE_SIZE: int
+    PAGE_PROCESSING_WORKERS: int
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Собирает Settings из окружения один раз на загрузку модуля.
+    После importlib.reload (см. /config) кеш создается заново и подхватывает новые значения.
+    """
+    return Settings(
+        APP_VERSION=os.getenv("APP_VERSION", "0.41.0"),
+        GIT_COMMIT_SHA=os.getenv("GIT_COMMIT_SHA", "unknown"),
+
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY"),
+        ANTHROPIC_API_KEY=os.getenv("ANTHROPIC_API_KEY"),
+        DEEPSEEK_API_KEY=os.getenv("DEEPSEEK_API_KEY"),
+        DEEPSEEK_API_URL=os.getenv("DEEPSEEK_API_URL"),
+        OLLAMA_API_URL=os.getenv("OLLAMA_API_URL"),
+        OLLAMA_API_KEY=os.getenv("OLLAMA_API_KEY"),
+        KIMI_API_URL=os.getenv("KIMI_API_URL"),
+        KIMI_API_KEY=os.getenv("KIMI_API_KEY"),
+
+        CONFLUENCE_API_TOKEN=os.getenv("CONFLUENCE_API_TOKEN"),
+        CONFLUENCE_USER=os.getenv("CONFLUENCE_USER"),
+        CONFLUENCE_BASE_URL=os.getenv("CONFLUENCE_BASE_URL"),
+        CONFLUENCE_PASSWORD=os.getenv("CONFLUENCE_PASSWORD"),
+        # Максимальное число одновременных запросов страниц к Confluence
+        CONFLUENCE_MAX_CONCURRENCY=int(os.getenv("CONFLUENCE_MAX_CONCURRENCY", "16")),
+
+        # Размер пула потоков anyio для синхронного кода в async-маршрутах.
+        # Работа в основном ждет сеть (Confluence, LLM), поэтому по умолчанию 128;
+        # для CPU-нагруженных развертываний значение стоит уменьшить
+        ANYIO_THREAD_TOKENS=int(os.getenv("ANYIO_THREAD_TOKENS", "128")),
+
+        # ДОБАВЛЯЕМ конфигурацию JIRA
+        JIRA_BASE_URL=os.getenv("JIRA_BASE_URL", "https://jira.gboteam.ru"),
+        JIRA_USER=os.getenv("JIRA_USER"),
+        JIRA_PASSWORD=os.getenv("JIRA_PASSWORD"),
+        JIRA_API_TOKEN=os.getenv("JIRA_API_TOKEN"),  # Альтернатива паролю
+
+        LLM_PROVIDER=os.getenv("LLM_PROVIDER"),
+        LLM_MODEL=os.getenv("LLM_MODEL", "gpt-4"),  # gpt-3.5-turbo, gpt-3.5-turbo-16k, gpt-4-32k...
+        LLM_TEMPERATURE=os.getenv("LLM_TEMPERATURE", "0.2"),
+
+        # openai | huggingface
+        EMBEDDING_PROVIDER=os.getenv("EMBEDDING_PROVIDER", "huggingface"),
+        # EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/text-embedding-ada-002") # 1536
+        EMBEDDING_MODEL=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),  # 384
+
+        CHROMA_PERSIST_DIR=os.getenv("CHROMA_PERSIST_DIR", "./chroma"),
+
+        PAGE_ANALYSIS_PROMPT_FILE=os.getenv("PAGE_ANALYSIS_PROMPT_FILE", "page_prompt_template.txt"),
+        TEMPLATE_ANALYSIS_PROMPT_FILE=os.getenv("TEMPLATE_ANALYSIS_PROMPT_FILE", "template-analysis-prompt.txt"),
+
+        SERVICES_REGISTRY_FILE=os.getenv("SERVICES_REGISTRY_FILE", "services.json"),
+        TEMPLATES_REGISTRY_FILE=os.getenv("TEMPLATES_REGISTRY_FILE", "templates.json"),
+
+        PAGE_CACHE_TTL=int(os.getenv("PAGE_CACHE_TTL", "60")),  # по умолчанию 5 минут
+        PAGE_CACHE_SIZE=int(os.getenv("PAGE_CACHE_SIZE", "1000")),  # по умолчанию 1000 странниц
+        # Число версий страниц, обработанные данные которых переживают истечение TTL кеша страниц
+        PROCESSED_CACHE_SIZE=int(os.getenv("PROCESSED_CACHE_SIZE", "100")),
+        # Число процессов для обработки HTML загружаемых страниц; 0 - обработка в потоке запроса
+        PAGE_PROCESSING_WORKERS=int(os.getenv("PAGE_PROCESSING_WORKERS", "0")),
+    )
+
+
+# Модульные константы оставлены для существующих импортов вида `from app.config import X`
+_settings = get_settings()
+
+APP_VERSION = _settings.APP_VERSION
+GIT_COMMIT_SHA = _settings.GIT_COMMIT_SHA
+
+OPENAI_API_KEY = _settings.OPENAI_API_KEY
+ANTHROPIC_API_KEY = _settings.ANTHROPIC_API_KEY
+DEEPSEEK_API_KEY = _settings.DEEPSEEK_API_KEY
+DEEPSEEK_API_URL = _settings.DEEPSEEK_API_URL
+OLLAMA_API_URL = _settings.OLLAMA_API_URL
+OLLAMA_API_KEY = _settings.OLLAMA_API_KEY
+KIMI_API_URL = _settings.KIMI_API_URL
+KIMI_API_KEY = _settings.KIMI_API_KEY
+
+CONFLUENCE_API_TOKEN = _settings.CONFLUENCE_API_TOKEN
+CONFLUENCE_USER = _settings.CONFLUENCE_USER
+CONFLUENCE_BASE_URL = _settings.CONFLUENCE_BASE_URL
+CONFLUENCE_PASSWORD = _settings.CONFLUENCE_PASSWORD
+CONFLUENCE_MAX_CONCURRENCY = _settings.CONFLUENCE_MAX_CONCURRENCY
+
+ANYIO_THREAD_TOKENS = _settings.ANYIO_THREAD_TOKENS
+
+JIRA_BASE_URL = _settings.JIRA_BASE_URL
+JIRA_USER = _settings.JIRA_USER
+JIRA_PASSWORD = _settings.JIRA_PASSWORD
+JIRA_API_TOKEN = _settings.JIRA_API_TOKEN
+
+LLM_PROVIDER = _settings.LLM_PROVIDER
+LLM_MODEL = _settings.LLM_MODEL
+LLM_TEMPERATURE = _settings.LLM_TEMPERATURE
 LLM_CONTEXT_SIZE = 128000
 
-# openai | huggingface
-EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "huggingface")
-# EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/text-embedding-ada-002") # 1536
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2") # 384
+EMBEDDING_PROVIDER = _settings.EMBEDDING_PROVIDER
+EMBEDDING_MODEL = _settings.EMBEDDING_MODEL
 
-CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./chroma")
+CHROMA_PERSIST_DIR = _settings.CHROMA_PERSIST_DIR
 
-PAGE_ANALYSIS_PROMPT_FILE = os.getenv("PAGE_ANALYSIS_PROMPT_FILE", "page_prompt_template.txt")
-TEMPLATE_ANALYSIS_PROMPT_FILE = os.getenv("TEMPLATE_ANALYSIS_PROMPT_FILE", "template-analysis-prompt.txt")
+PAGE_ANALYSIS_PROMPT_FILE = _settings.PAGE_ANALYSIS_PROMPT_FILE
+TEMPLATE_ANALYSIS_PROMPT_FILE = _settings.TEMPLATE_ANALYSIS_PROMPT_FILE
 
 # Название единого хранилища
 UNIFIED_STORAGE_NAME = "unified_requirements"
 
-SERVICES_REGISTRY_FILE = os.getenv("SERVICES_REGISTRY_FILE", "services.json")
-TEMPLATES_REGISTRY_FILE = os.getenv("TEMPLATES_REGISTRY_FILE", "templates.json")
+SERVICES_REGISTRY_FILE = _settings.SERVICES_REGISTRY_FILE
+TEMPLATES_REGISTRY_FILE = _settings.TEMPLATES_REGISTRY_FILE
 
-PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "60"))  # по умолчанию 5 минут
-PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "1000")) # по умолчанию 1000 странниц
+PAGE_CACHE_TTL = _settings.PAGE_CACHE_TTL
+PAGE_CACHE_SIZE = _settings.PAGE_CACHE_SIZE
+PROCESSED_CACHE_SIZE = _settings.PROCESSED_CACHE_SIZE
+PAGE_PROCESSING_WORKERS = _settings.PAGE_PROCESSING_WORKERS
 
 # Chunking нужен, только если:
 # - Страницы > 2-3k токенов
@@ -0,0 +1,54 @@
+# app/confluence_client.py
+
+import logging
+from functools import lru_cache
+
+from atlassian import Confluence
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.config import CONFLUENCE_BASE_URL, CONFLUENCE_USER, CONFLUENCE_PASSWORD, CONFLUENCE_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# Повтор на уровне соединения: запрос, попавший на закрытое сервером keep-alive
+# соединение из пула, сразу повторяется на новом соединении без выхода в retry-цикл
+# загрузки страницы с его паузами. Повторяются только идемпотентные методы (GET и т.п.),
+# ответы сервера (429, 5xx) возвращаются как есть
+_CONNECTION_RETRY = Retry(total=2, connect=2, read=1, backoff_factor=0.5, respect_retry_after_header=False)
+
+
+@lru_cache(maxsize=1)
+def get_confluence() -> Confluence:
+    """
+    Возвращает единственный на процесс клиент Confluence с общим пулом соединений.
+    Клиент создается при первом обращении, а не при импорте модуля.
+    """
+    if CONFLUENCE_BASE_URL is None:
+        raise ValueError("Переменная окружения CONFLUENCE_BASE_URL не задана")
+
+    logger.info("[get_confluence] Creating Confluence client for %s", CONFLUENCE_BASE_URL)
+    confluence = Confluence(
+        url=CONFLUENCE_BASE_URL,
+        username=CONFLUENCE_USER,
+        password=CONFLUENCE_PASSWORD,
+        # если выдвется ошибка сертификата или не проходит коннект из-за проверки - скидывай в False
+        verify_ssl=True
+    )
+    mount_pooled_adapter(confluence)
+    return confluence
+
+
+def mount_pooled_adapter(confluence: Confluence) -> None:
+    """
+    Подключает к сессии клиента пул keep-alive соединений по размеру параллельной
+    загрузки страниц: при стандартном пуле (10) лишние потоки открывали бы и сразу
+    закрывали собственные соединения, повторяя TCP/TLS рукопожатие.
+    """
+    pooled_adapter = HTTPAdapter(
+        pool_connections=CONFLUENCE_MAX_CONCURRENCY,
+        pool_maxsize=CONFLUENCE_MAX_CONCURRENCY,
+        max_retries=_CONNECTION_RETRY
+    )
+    confluence.session.mount("https://", pooled_adapter)
+    confluence.session.mount("http://", pooled_adapter)
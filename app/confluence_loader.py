@@ -2,41 +2,29 @@
 
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
-from atlassian import Confluence
-from requests import ReadTimeout
+from requests import ConnectionError, ReadTimeout
+from tenacity import retry, stop_after_attempt, wait_exponential
 
-from app.config import CONFLUENCE_BASE_URL, CONFLUENCE_USER, CONFLUENCE_PASSWORD
+from app.config import CONFLUENCE_MAX_CONCURRENCY
+from app.confluence_client import get_confluence
 from app.filter_approved_fragments import filter_approved_fragments
 
-if CONFLUENCE_BASE_URL is None:
-    raise ValueError("Переменная окружения CONFLUENCE_BASE_URL не задана")
-
-confluence = Confluence(
-    url=CONFLUENCE_BASE_URL,
-    username=CONFLUENCE_USER,
-    password=CONFLUENCE_PASSWORD,
-    # если выдвется ошибка сертификата или не проходит коннект из-за проверки - скидывай в False
-    verify_ssl=True
-)
-
 logger = logging.getLogger(__name__)
 
-try:
-    from markdownify import markdownify as markdownify_fn
-except ImportError:
-    logging.error("[extract_approved_fragments] markdownify package not installed. Install it using 'pip install markdownify'")
-    raise ImportError("markdownify package is required")
 
 def extract_approved_fragments(html: str) -> str:
     """
     Извлекает только одобренные (чёрные) фрагменты текста, включая ссылки и таблицы.
     """
-    logger.debug("[extract_approved_fragments] <- html={%s}", html)
+    # Пустые страницы-заглушки не разбираем
+    if not html or not html.strip():
+        return ""
+    logger.debug("[extract_approved_fragments] <- html={%.500s...}", html)
     return filter_approved_fragments(html)
 
 
-from tenacity import retry, stop_after_attempt, wait_exponential
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
 def get_page_content_by_id(page_id: str, clean_html: bool = True) -> Optional[str]:
     """
@@ -80,6 +68,54 @@ def get_page_title_by_id(page_id: str) -> Optional[str]:
     return page_data['title']
 
 
+def _load_one(page_id: str, page: Optional[Dict] = None) -> Optional[Dict[str, str]]:
+    """
+    Загружает одну страницу через кеш и проверяет обязательные поля.
+    page - ответ Confluence из пакетной загрузки, если страница в него попала.
+    Возвращает None, если страницу нужно пропустить.
+    """
+    logger.debug("[load_pages_by_ids] Processing page_id=%s", page_id)
+
+    from app.page_cache import get_page_data_cached
+
+    page_data = get_page_data_cached(page_id, page)
+
+    if not page_data:
+        logger.warning("[load_pages_by_ids] Пропущена страница {%s} из-за ошибок загрузки.", page_id)
+        return None
+
+    # ИСПРАВЛЕНИЕ: Добавляем детальную проверку каждого поля
+    title = page_data.get('title')
+    full_markdown = page_data.get('full_markdown')
+    approved_content = page_data.get('approved_content')
+    requirement_type = page_data.get('requirement_type')
+
+    logger.debug("[load_pages_by_ids] page_id=%s -> title='%s', has_markdown=%s, has_approved=%s, type='%s'",
+                 page_id, title, bool(full_markdown), bool(approved_content), requirement_type)
+
+    # Проверяем наличие обязательных данных
+    if not title:
+        logger.warning("[load_pages_by_ids] Пропущена страница {%s}: отсутствует title.", page_id)
+        return None
+
+    if not full_markdown:
+        logger.warning("[load_pages_by_ids] Пропущена страница {%s}: отсутствует full_markdown.", page_id)
+        return None
+
+    if not approved_content:
+        logger.warning("[load_pages_by_ids] Пропущена страница {%s}: отсутствует approved_content.", page_id)
+        return None
+
+    logger.debug("[load_pages_by_ids] Успешно добавлена страница: id=%s, title='%s'", page_id, title)
+    return {
+        "id": page_id,
+        "title": title,
+        "content": full_markdown,
+        "approved_content": approved_content,
+        "requirement_type": requirement_type
+    }
+
+
 def load_pages_by_ids(page_ids: List[str]) -> List[Dict[str, str]]:
     """
     Загрузка страниц из Confluence по идентификаторам и разбиение на:
@@ -90,102 +126,157 @@ def load_pages_by_ids(page_ids: List[str]) -> List[Dict[str, str]]:
     Returns:
         страницы (словари) с id, title, content, approved_content, requirement_type.
     """
-    logger.info("[load_pages_by_ids] <- page_ids={%s}", page_ids)
-
-    from app.page_cache import get_page_data_cached
+    logger.info("[load_pages_by_ids] <- %d page(s)", len(page_ids))
+    logger.debug("[load_pages_by_ids] page_ids=%s", page_ids)
 
-    pages = []
-    for page_id in page_ids:
-        logger.debug("[load_pages_by_ids] Processing page_id=%s", page_id)
+    if not page_ids:
+        return []
 
-        page_data = get_page_data_cached(page_id)
+    # Страницы загружаются параллельно: работа упирается в сетевые задержки Confluence.
+    # Повторяющиеся идентификаторы загружаются один раз и не занимают лишние потоки
+    unique_ids = list(dict.fromkeys(page_ids))
 
-        if not page_data:
-            logger.warning("[load_pages_by_ids] Пропущена страница {%s} из-за ошибок загрузки.", page_id)
-            continue
+    # Отсутствующие в кеше страницы запрашиваются пакетами через CQL; не вернувшиеся
+    # в пакетном ответе загружаются по одной
+    from app.page_cache import prefetch_pages
+    prefetched = prefetch_pages(unique_ids)
 
-        # ИСПРАВЛЕНИЕ: Добавляем детальную проверку каждого поля
-        title = page_data.get('title')
-        full_markdown = page_data.get('full_markdown')
-        approved_content = page_data.get('approved_content')
-        requirement_type = page_data.get('requirement_type')
+    with ThreadPoolExecutor(max_workers=min(CONFLUENCE_MAX_CONCURRENCY, len(unique_ids))) as executor:
+        loaded = dict(zip(unique_ids, executor.map(
+            lambda page_id: _load_one(page_id, prefetched.get(page_id)), unique_ids)))
 
-        logger.debug("[load_pages_by_ids] page_id=%s -> title='%s', has_markdown=%s, has_approved=%s, type='%s'",
-                     page_id, title, bool(full_markdown), bool(approved_content), requirement_type)
-
-        # Проверяем наличие обязательных данных
-        if not title:
-            logger.warning("[load_pages_by_ids] Пропущена страница {%s}: отсутствует title.", page_id)
-            continue
-
-        if not full_markdown:
-            logger.warning("[load_pages_by_ids] Пропущена страница {%s}: отсутствует full_markdown.", page_id)
-            continue
-
-        if not approved_content:
-            logger.warning("[load_pages_by_ids] Пропущена страница {%s}: отсутствует approved_content.", page_id)
-            continue
-
-        pages.append({
-            "id": page_id,
-            "title": title,
-            "content": full_markdown,
-            "approved_content": approved_content,
-            "requirement_type": requirement_type
-        })
-
-        logger.debug("[load_pages_by_ids] Успешно добавлена страница: id=%s, title='%s'", page_id, title)
+    # Результат сохраняет исходный порядок page_ids
+    pages = [loaded[page_id] for page_id in page_ids if loaded[page_id] is not None]
 
     logger.info("[load_pages_by_ids] -> Успешно загружено страниц: %s из %s", len(pages), len(page_ids))
     return pages
 
 
 def load_template_markdown(page_id: str) -> Optional[str]:
-    html = get_page_content_by_id(page_id, clean_html=False)
-    if not html:
+    """
+    Возвращает подтвержденный контент шаблона.
+    Одобренные фрагменты уже извлечены при загрузке страницы в кеш,
+    поэтому повторно HTML не запрашивается и не разбирается.
+    """
+    from app.page_cache import get_page_data_cached
+
+    page_data = get_page_data_cached(page_id)
+    if not page_data:
         return None
-    return extract_approved_fragments(html)
+    return page_data['approved_content']
 
 
-def get_child_page_ids(page_id: str) -> List[str]:
-    """Возвращает список идентификаторов всех дочерних страниц."""
-    child_page_ids = []
-    visited_pages = set()
-    max_retries = 3
+# Размер страницы выдачи CQL-поиска (максимум, который отдает Confluence за один запрос)
+CQL_PAGE_LIMIT = 250
 
-    def fetch_children(current_page_id: str, retry_count: int = 0):
-        """Рекурсивно собирает идентификаторы дочерних страниц."""
-        if current_page_id in visited_pages:
-            logger.warning("[fetch_children] Circular reference detected for page_id=%s", current_page_id)
-            return
 
-        visited_pages.add(current_page_id)
-        logger.debug("[fetch_children] <- current_page_id={%s}", current_page_id)
+def _get_descendant_ids_by_cql(page_id: str) -> List[str]:
+    """
+    Получает идентификаторы всех потомков страницы через CQL-поиск по ancestor.
+    Дерево любой глубины выбирается постранично за ceil(N / CQL_PAGE_LIMIT) запросов
+    вместо одного запроса на каждый узел.
+    """
+    confluence = get_confluence()
+    cql = f"ancestor = {page_id} and type = page"
+    descendant_ids = []
+    start = 0
+    requests_count = 0
+
+    while True:
+        response = confluence.cql(cql, start=start, limit=CQL_PAGE_LIMIT, excerpt="none")
+        requests_count += 1
+        batch = response.get("results", [])
+        for item in batch:
+            descendant_ids.append(item["content"]["id"])
+
+        # Сервер может урезать limit, поэтому конец выдачи определяем по ссылке next
+        if not batch or "next" not in response.get("_links", {}):
+            break
+        start += len(batch)
+
+    logger.debug("[_get_descendant_ids_by_cql] page_id=%s -> %d ids in %d requests",
+                 page_id, len(descendant_ids), requests_count)
+    return descendant_ids
+
+
+def _fetch_child_pages(page_id: str, max_retries: int = 3) -> List[Dict]:
+    """
+    Запрашивает непосредственные дочерние страницы с повтором при таймауте.
+    При неустранимой ошибке возвращает пустой список, чтобы обход дерева продолжился.
+    """
+    logger.debug("[get_child_page_ids] <- current_page_id={%s}", page_id)
 
+    for retry_count in range(max_retries + 1):
         try:
-            children = confluence.get_child_pages(current_page_id)
-            for child in children:
-                child_id = child["id"]
-                child_page_ids.append(child_id)
-                logger.debug("[get_child_page_ids] Found child page: %s for parent: %s", child_id, current_page_id)
-                fetch_children(child_id)
-
-        except ReadTimeout as e:
+            # get_child_pages возвращает генератор, который запрашивает страницы выдачи
+            # по мере перебора. Список собирается здесь: все запросы выполняются в потоке
+            # пула и под retry, а не позже в цикле обхода
+            return list(get_confluence().get_child_pages(page_id))
+        except (ReadTimeout, ConnectionError) as e:
+            # Адаптер пула с повтором соединения (confluence_client) отдает таймаут
+            # чтения как ConnectionError после исчерпания собственных повторов
             if retry_count < max_retries:
-                logger.warning(f"Timeout for page {current_page_id}, retry {retry_count + 1}/{max_retries}")
+                logger.warning("[get_child_page_ids] Timeout for page %s, retry %d/%d",
+                               page_id, retry_count + 1, max_retries)
                 time.sleep(2 ** retry_count)  # Exponential backoff
-                fetch_children(current_page_id, retry_count + 1)
             else:
-                logger.error(f"Failed to fetch children for page {current_page_id} after {max_retries} retries: {e}")
                 # Продолжаем работу, но пропускаем эту страницу
-
+                logger.error("[get_child_page_ids] Failed to fetch children for page %s after %d retries: %s",
+                             page_id, max_retries, e)
         except Exception as e:
-            logger.error(f"Failed to fetch children for page {current_page_id}: {str(e)}")
             # Продолжаем работу вместо полного падения
+            logger.error("[get_child_page_ids] Failed to fetch children for page %s: %s", page_id, str(e))
+            break
+    return []
+
+
+def get_child_page_ids(page_id: str) -> List[str]:
+    """
+    Возвращает список идентификаторов всех дочерних страниц.
+    Сначала используется CQL-поиск по ancestor (порядок выдачи поиска), при его
+    недоступности - обход дерева (прямой порядок обхода в глубину).
+    """
+    # page_id подставляется в текст CQL, поэтому поиск выполняется только для
+    # идентификаторов из цифр ASCII; остальные сразу обходятся через REST
+    if page_id.isascii() and page_id.isdigit():
+        try:
+            return _get_descendant_ids_by_cql(page_id)
+        except Exception as e:
+            logger.warning("[get_child_page_ids] CQL search failed for page_id=%s, falling back to tree traversal: %s",
+                           page_id, str(e))
+    else:
+        logger.warning("[get_child_page_ids] Non-numeric page_id=%s, using tree traversal", page_id)
+
+    # Дочерние страницы запрашиваются по уровням: списки детей всех узлов текущего
+    # уровня загружаются параллельно, поэтому число последовательных раундов запросов
+    # равно глубине дерева, а не числу узлов
+    children_by_page = {}
+    discovered_pages = {page_id}
+    frontier = [page_id]
+    with ThreadPoolExecutor(max_workers=CONFLUENCE_MAX_CONCURRENCY) as executor:
+        while frontier:
+            next_frontier = []
+            for current_page_id, children in zip(frontier, executor.map(_fetch_child_pages, frontier)):
+                children_by_page[current_page_id] = [child["id"] for child in children]
+                for child_id in children_by_page[current_page_id]:
+                    if child_id not in discovered_pages:
+                        discovered_pages.add(child_id)
+                        next_frontier.append(child_id)
+            frontier = next_frontier
+
+    # Результат собирается в прямом порядке обхода в глубину, как при рекурсивном
+    # обходе: за страницей следуют все ее потомки
+    child_page_ids = []
+    visited_pages = {page_id}
+    stack = [(child_id, page_id) for child_id in reversed(children_by_page[page_id])]
+    while stack:
+        child_id, parent_id = stack.pop()
+        if child_id in visited_pages:
+            logger.warning("[get_child_page_ids] Circular reference detected for page_id=%s", child_id)
+            continue
+        visited_pages.add(child_id)
+        child_page_ids.append(child_id)
+        logger.debug("[get_child_page_ids] Found child page: %s for parent: %s", child_id, parent_id)
+        stack.extend((grandchild_id, child_id) for grandchild_id in reversed(children_by_page.get(child_id, [])))
 
-    try:
-        fetch_children(page_id)
-        return child_page_ids
-    except Exception as e:
-        logging.exception("Error fetching child pages for page_id=%s", page_id)
-        return child_page_ids  # Возвращаем то, что успели собрать
\ No newline at end of file
+    return child_page_ids
@@ -2,17 +2,120 @@
 
 import logging
 import re
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from bs4 import BeautifulSoup, Tag, NavigableString
 from dataclasses import dataclass
-from app.utils.style_utils import is_black_color, has_colored_style
+from app.utils.html_utils import parse_html
+from app.utils.style_utils import is_black_color, has_colored_style, get_style_color, STYLE_WITH_COLOR_RE
 
 logger = logging.getLogger(__name__)
 
+# Пробельные символы, которые BeautifulSoup схлопывает в текстовых узлах из одних пробелов
+_ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+# Теги, внутри которых BeautifulSoup сохраняет пробелы как есть
+_PRESERVE_WHITESPACE_TAGS = ["pre", "textarea"]
+
+# Регулярные выражения очистки компилируются один раз при импорте модуля
+# Начало блочного элемента после ведущих пробелов: заголовок (#), таблица (|, а также
+# наша "**Таблица:**"), маркированный (-, *, +) или нумерованный список
+_BLOCK_START_RE = re.compile(r'\s*(?:[#|*+\-]|\d+\.)')
+_LONG_SPACES_RE = re.compile(r' {4,}')
+_TRIANGULAR_BRACKETS_RE = re.compile(r'<\s*([^<>]*?)\s*>')
+_WORD_BEFORE_QUOTE_RE = re.compile(r'(\w)"')
+
+
+# Маркеры маркированных списков по уровням вложенности
+_UL_MARKERS = ("-", "*", "+")
+# Заголовки всех уровней
+_HEADER_TAGS = frozenset(["h1", "h2", "h3", "h4", "h5", "h6"])
+# Структурные элементы, при наличии которых ячейка таблицы собирается по дочерним элементам
+_CELL_STRUCTURAL_TAGS = _HEADER_TAGS | {"ul", "ol", "div", "p"}
+# Теги, которые могут игнорироваться: зачеркнутый текст и Jira-макросы с параметрами
+_IGNORABLE_TAGS = frozenset(["s", "ac:structured-macro", "ac:parameter"])
+# Ячейки строки таблицы
+_TABLE_CELL_TAGS = ("td", "th")
+
+
+def _child_tags(element: Tag, names: Tuple[str, ...]) -> List[Tag]:
+    """
+    Непосредственные дочерние теги с заданными именами, в порядке документа.
+    То же, что find_all(names, recursive=False), но без механизма фильтров bs4
+    на каждом дочернем узле.
+    """
+    return [child for child in element.children if isinstance(child, Tag) and child.name in names]
+
+
+def _span_attrs(cell: Tag) -> List[str]:
+    """
+    HTML-атрибуты объединения ячейки (rowspan/colspan) со значением больше 1.
+    Каждый атрибут читается один раз; значение по умолчанию "1" не разбирается.
+    """
+    attrs = []
+    for name in ("rowspan", "colspan"):
+        value = cell.get(name)
+        if value and value != "1" and int(value) > 1:
+            attrs.append(f'{name}="{value}"')
+    return attrs
+
+
+def _table_rows(table: Tag) -> Tuple[List[Tag], List[Tag], List[Tag]]:
+    """
+    Строки таблицы за один проход по ее дочерним элементам:
+    (строки thead, строки tbody, строки без секции). Учитываются только секции
+    самой таблицы, а не вложенных в ее ячейки таблиц.
+    """
+    head_rows, body_rows, direct_rows = [], [], []
+    for child in table.children:
+        if not isinstance(child, Tag):
+            continue
+        if child.name == "tr":
+            direct_rows.append(child)
+        elif child.name == "thead":
+            head_rows.extend(_child_tags(child, ("tr",)))
+        elif child.name == "tbody":
+            body_rows.extend(_child_tags(child, ("tr",)))
+    return head_rows, body_rows, direct_rows
+
+
+def _is_plain_text(html: str) -> bool:
+    """Строка без тегов и HTML-сущностей: после разбора она осталась бы одним текстовым узлом"""
+    return "<" not in html and "&" not in html
+
+
+def _parse_without_history(html: str) -> BeautifulSoup:
+    """
+    Разбирает HTML и удаляет разделы истории изменений прямо в дереве.
+    Текстовые узлы, ставшие соседними после удаления, приводятся к виду, который
+    дал бы повторный разбор очищенного HTML: они объединяются, пробельные узлы
+    схлопываются, пробелы в начале документа отбрасываются.
+    """
+    from app.history_cleaner import remove_history_sections_from_soup
+
+    soup = parse_html(html)
+    if not remove_history_sections_from_soup(soup):
+        return soup
 
-@dataclass
+    soup.smooth()
+    for string in soup.find_all(string=True):
+        if type(string) is not NavigableString or string.strip(_ASCII_SPACES):
+            continue
+        collapsed = "\n" if "\n" in string else " "
+        if string != collapsed and not string.find_parent(_PRESERVE_WHITESPACE_TAGS):
+            string.replace_with(collapsed)
+
+    container = soup.body or soup
+    while container.contents and type(container.contents[0]) is NavigableString \
+            and not container.contents[0].strip(_ASCII_SPACES):
+        container.contents[0].extract()
+    return soup
+
+
+@dataclass(frozen=True, slots=True)
 class ExtractionConfig:
-    """Конфигурация/настройки для извлечения контента"""
+    """
+    Конфигурация/настройки для извлечения контента.
+    Неизменяемая, со слотами: поля читаются при обработке каждого элемента
+    """
     include_colored: bool = True  # True - все фрагменты, False - только подтвержденные
     preserve_whitespace: bool = True  # Сохранять пробелы
     normalize_spacing: bool = False  # Отключаем агрессивную нормализацию
@@ -29,20 +132,67 @@ class ContentExtractor:
 
     def __init__(self, config: ExtractionConfig):
         self.config = config
+        # id() цветных элементов текущего документа; None - набор не вычислен
+        self._colored_ids: Optional[set] = None
+        # id() элемента -> есть ли цветной элемент в цепочке от него вверх до границы
+        # ac:rich-text-body; заполняется при проверке предков в текущем документе
+        self._colored_chain_cache: Dict[int, bool] = {}
+        # Обработчики по имени тега: один поиск в словаре вместо цепочки сравнений
+        # в _process_element. Теги без обработчика обрабатываются как контейнер
+        self._element_handlers: Dict[str, Callable[[Tag, str], str]] = {
+            **dict.fromkeys(sorted(_HEADER_TAGS), self._process_header),
+            "table": self._process_table,
+            **dict.fromkeys(["ul", "ol"], self._process_list),
+            **dict.fromkeys(["a", "ac:link"], self._process_link),
+            "time": self._process_time,
+            "p": self._process_paragraph,
+            **dict.fromkeys(["div", "span"], self._process_text_container),
+            **dict.fromkeys(["ac:rich-text-body", "ac:layout", "ac:layout-section", "ac:layout-cell"],
+                            self._process_confluence_container),
+            **dict.fromkeys(["td", "th"], self._process_table_cell),
+            "li": self._process_list_item,
+        }
+        # То же для обработки внутри подтвержденного (черного) элемента, без цветовой фильтрации.
+        # Теги без обработчика - контейнеры, обрабатываются их дочерние элементы
+        self._filter_free_handlers: Dict[str, Callable[[Tag, str], str]] = {
+            **dict.fromkeys(sorted(_HEADER_TAGS), self._process_header_without_color_filter),
+            **dict.fromkeys(["a", "ac:link"], self._process_link),
+            "p": self._process_paragraph_without_color_filter,
+        }
 
     def extract(self, html: str) -> str:
         """Главная точка входа с отладкой HTML"""
         if not html or not html.strip():
             return ""
 
-        from app.history_cleaner import remove_history_sections
-        html = remove_history_sections(html)
+        # Текст без разметки и сущностей: разбор HTML и очистка истории не нужны
+        if _is_plain_text(html):
+            return self._finalize_parts([self._process_text_node(html, "default")])
 
-        soup = BeautifulSoup(html, "html.parser")
+        # История изменений удаляется прямо в разобранном дереве, без сериализации
+        # очищенного HTML в строку и повторного разбора
+        soup = _parse_without_history(html)
 
         self._process_expand_blocks(soup)
 
-        result_parts = self._process_container(soup)
+        return self.extract_from_soup(soup)
+
+    def extract_from_soup(self, soup: BeautifulSoup, colored_ids: Optional[set] = None) -> str:
+        """
+        Извлекает контент из уже разобранного и подготовленного дерева
+        (история изменений удалена, expand-блоки раскрыты). Дерево не изменяется,
+        поэтому один разбор можно использовать несколькими экстракторами.
+        colored_ids - уже собранный для этого дерева набор цветных элементов.
+        """
+        if not self.config.include_colored:
+            self._colored_ids = colored_ids if colored_ids is not None else self._collect_colored_ids(soup)
+            self._colored_chain_cache = {}
+
+        # lxml оборачивает фрагмент в <html><body>, обрабатываем содержимое body
+        return self._finalize_parts(self._process_container(soup.body or soup))
+
+    def _finalize_parts(self, result_parts: List[str]) -> str:
+        """Собирает итоговый текст из частей верхнего уровня"""
         result = self._join_parts_preserving_structure(result_parts)
 
         if self.config.normalize_spacing:
@@ -50,6 +200,21 @@ class ContentExtractor:
 
         return result
 
+    @staticmethod
+    def _collect_colored_ids(soup: BeautifulSoup) -> set:
+        """
+        Один раз на документ находит цветные элементы. Проверяются только элементы,
+        у которых в style встречается "color", - у большинства элементов style нет вовсе.
+        """
+        return {id(element) for element in soup.find_all(style=STYLE_WITH_COLOR_RE)
+                if has_colored_style(element)}
+
+    def _has_colored_style(self, element: Tag) -> bool:
+        """has_colored_style с проверкой по заранее собранному набору цветных элементов"""
+        if self._colored_ids is None:
+            return has_colored_style(element)
+        return id(element) in self._colored_ids
+
     def _process_table(self, element: Tag, context: str) -> str:
         """
         ИСПРАВЛЕНО: Обработка таблиц с правильным порядком заголовков
@@ -68,35 +233,24 @@ class ContentExtractor:
         # Собираем строки в правильном порядке
         table_rows = []
 
+        head_rows, body_rows, direct_rows = _table_rows(element)
+
         # 1. Обрабатываем ВСЕ строки из thead как заголовки
         # независимо от того, используют они <th> или <td>
-        thead = element.find("thead")
-        if thead:
-            header_rows = thead.find_all("tr", recursive=False)
-            for row in header_rows:
-                cells = row.find_all(["td", "th"], recursive=False)
-                if cells:
-                    # КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: Все строки из thead обрабатываем как заголовки
-                    row_data = self._process_table_row_cells(cells, context, is_header=True)
-                    if row_data:
-                        table_rows.append(("header", row_data))
-
         # 2. ЗАТЕМ обрабатываем тело таблицы из tbody
-        tbody = element.find("tbody")
-        if tbody:
-            body_rows = tbody.find_all("tr", recursive=False)
-            for row in body_rows:
-                cells = row.find_all(["td", "th"], recursive=False)
+        for section_rows, is_header in ((head_rows, True), (body_rows, False)):
+            row_type = "header" if is_header else "body"
+            for row in section_rows:
+                cells = _child_tags(row, _TABLE_CELL_TAGS)
                 if cells:
-                    row_data = self._process_table_row_cells(cells, context, is_header=False)
+                    row_data = self._process_table_row_cells(cells, context, is_header=is_header)
                     if row_data:
-                        table_rows.append(("body", row_data))
+                        table_rows.append((row_type, row_data))
 
         # 3. Если нет явных thead/tbody, берем все tr напрямую
         if not table_rows:
-            direct_rows = element.find_all("tr", recursive=False)
             for i, row in enumerate(direct_rows):
-                cells = row.find_all(["td", "th"], recursive=False)
+                cells = _child_tags(row, _TABLE_CELL_TAGS)
                 if cells:
                     # Первая строка считается заголовком, если все ячейки - th
                     is_header = (i == 0 and all(cell.name == "th" for cell in cells))
@@ -118,7 +272,8 @@ class ContentExtractor:
                 table_lines.append("| " + " | ".join(row_data) + " |")
                 # Добавляем разделитель только после ПЕРВОГО заголовка
                 if not has_separator:
-                    table_lines.append("|" + "|".join([" --- " for _ in row_data]) + "|")
+                    # row_data не пуст: пустые строки в table_rows не попадают
+                    table_lines.append("|" + " --- |" * len(row_data))
                     has_separator = True
             elif row_type == "body":
                 # Добавляем строки тела таблицы
@@ -162,11 +317,7 @@ class ContentExtractor:
             content = ""
 
         # Добавляем HTML атрибуты для объединенных ячеек
-        html_attrs = []
-        if cell.get("rowspan") and int(cell.get("rowspan", 1)) > 1:
-            html_attrs.append(f'rowspan="{cell["rowspan"]}"')
-        if cell.get("colspan") and int(cell.get("colspan", 1)) > 1:
-            html_attrs.append(f'colspan="{cell["colspan"]}"')
+        html_attrs = _span_attrs(cell)
 
         if html_attrs:
             attrs_str = " ".join(html_attrs)
@@ -197,45 +348,10 @@ class ContentExtractor:
                 return self._extract_black_elements_from_colored_container(element, context)
             return None
 
-        # Заголовки
-        if element.name in ["h1", "h2", "h3", "h4", "h5", "h6"]:
-            return self._process_header(element, context)
-
-        # Таблицы
-        if element.name == "table":
-            return self._process_table(element, context)
-
-        # Списки
-        if element.name in ["ul", "ol"]:
-            return self._process_list(element, context)
-
-        # Ссылки
-        if element.name in ["a", "ac:link"]:
-            return self._process_link(element, context)
-
-        # Время
-        if element.name == "time" and element.get("datetime"):
-            return element["datetime"]
-
-        # Параграфы с добавлением переводов строк
-        if element.name == "p":
-            return self._process_paragraph(element, context)
-
-        # div/span
-        if element.name in ["div", "span"]:
-            return self._process_text_container(element, context)
-
-        # Confluence элементы
-        if element.name in ["ac:rich-text-body", "ac:layout", "ac:layout-section", "ac:layout-cell"]:
-            return self._process_confluence_container(element, context)
-
-        # Ячейки таблицы
-        if element.name in ["td", "th"]:
-            return self._process_table_cell(element, context)
-
-        # Элементы списка
-        if element.name == "li":
-            return self._process_list_item(element, context)
+        # Заголовки, таблицы, списки, ссылки, параграфы, Confluence-контейнеры, ячейки...
+        handler = self._element_handlers.get(element.name)
+        if handler is not None:
+            return handler(element, context)
 
         # По умолчанию - обрабатываем как контейнер
         return self._process_text_container(element, context)
@@ -253,12 +369,10 @@ class ContentExtractor:
                 processed_text = self._process_text_node(text, context)
                 result_parts.append(processed_text)
             elif isinstance(child, Tag):
-                # ИСПРАВЛЕНО: Проверяем игнорируемые элементы ДО обработки
-                if not self._is_ignored_element(child):
-                    child_content = self._process_element(child, context)
-                    if child_content is not None:
-                        result_parts.append(child_content)
-                # Если элемент игнорируемый (<s>) - просто пропускаем его
+                # Игнорируемые элементы (<s>, Jira-макросы) _process_element пропускает сам
+                child_content = self._process_element(child, context)
+                if child_content is not None:
+                    result_parts.append(child_content)
 
         # Соединяем БЕЗ добавления пробелов
         result = "".join(result_parts)
@@ -286,32 +400,27 @@ class ContentExtractor:
                     if self._is_ignored_element(child):
                         continue
 
-                    # Проверяем черные цвета напрямую
-                    child_style = child.get("style", "").lower()
-                    child_is_black = False
-
-                    if "color" in child_style:
-                        color_match = re.search(r'color\s*:\s*([^;]+)', child_style)
-                        if color_match:
-                            color_value = color_match.group(1).strip()
-                            child_is_black = is_black_color(color_value)
+                    # Цвет дочернего элемента определяется одним разбором style:
+                    # черный, цветной (любой другой цвет) или без цвета
+                    color_value = get_style_color(child)
+                    child_is_black = color_value is not None and is_black_color(color_value)
 
                     if child_is_black:
                         # ИСПРАВЛЕНО: Черный дочерний элемент - извлекаем БЕЗ цветовой фильтрации
                         child_text = self._process_children_without_color_filter(child, context)
                         if child_text:
                             approved_parts.append(child_text)
-                    elif has_colored_style(child):
+                    elif color_value is not None:
                         # Цветной дочерний элемент - рекурсивно ищем в нем черные части
                         child_text = self._extract_black_elements_from_colored_container(child, context)
                         if child_text:
                             approved_parts.append(child_text)
                     else:
                         # Элемент без цвета - обрабатываем как обычно
-                        if not self._is_ignored_element(child):
-                            child_text = self._process_element(child, context)
-                            if child_text:
-                                approved_parts.append(child_text)
+                        # (игнорируемые элементы уже пропущены выше)
+                        child_text = self._process_element(child, context)
+                        if child_text:
+                            approved_parts.append(child_text)
 
             return "".join(approved_parts)
 
@@ -324,12 +433,16 @@ class ContentExtractor:
         if self.config.include_colored:
             return True
 
+        # В документе нет цветных элементов - включается все, без проверок элемента и предков
+        if self._colored_ids is not None and not self._colored_ids:
+            return True
+
         # Ссылки всегда пропускаем для анализа соседей в _process_link
         if element.name in ['a', 'ac:link']:
             return True
 
         # Для остальных элементов применяем цветовую фильтрацию
-        if has_colored_style(element):
+        if self._has_colored_style(element):
             return False
 
         if self._is_in_colored_ancestor_chain(element):
@@ -358,6 +471,10 @@ class ContentExtractor:
         if not isinstance(element, Tag):
             return False
 
+        # Большинство элементов отсекается одной проверкой имени
+        if element.name not in _IGNORABLE_TAGS:
+            return False
+
         # Зачеркнутый текст
         if element.name == "s":
             return True
@@ -384,37 +501,32 @@ class ContentExtractor:
         if not non_empty_parts:
             return ""
 
-        result_parts = []
+        result_parts = [non_empty_parts[0]]
+        # Признак блочного элемента вычисляется для каждой части один раз
+        # и переносится на следующую границу
+        prev_part = non_empty_parts[0]
+        prev_is_block = self._is_block_element(prev_part)
 
-        for i, part in enumerate(non_empty_parts):
-            if i == 0:
-                result_parts.append(part)
+        for current_part in non_empty_parts[1:]:
+            current_is_block = self._is_block_element(current_part)
+
+            if prev_part[-1] == '\n' or current_part[0] == '\n':
+                result_parts.append(current_part)
+            elif prev_is_block or current_is_block:
+                result_parts.append('\n\n' + current_part)
             else:
-                prev_part = non_empty_parts[i - 1]
-                current_part = part
+                result_parts.append(current_part)
 
-                if (prev_part.endswith('\n') or current_part.startswith('\n')):
-                    result_parts.append(current_part)
-                elif (self._is_block_element(prev_part) or self._is_block_element(current_part)):
-                    result_parts.append('\n\n' + current_part)
-                else:
-                    result_parts.append(current_part)
+            prev_part, prev_is_block = current_part, current_is_block
 
         return "".join(result_parts)
 
     def _is_block_element(self, content: str) -> bool:
-        """Проверяет, является ли содержимое блочным элементом"""
-        if not content:
-            return False
-
-        content_start = content.lstrip()
-        return (content_start.startswith('#') or  # Заголовки
-                content_start.startswith('|') or  # Таблицы
-                content_start.startswith('**Таблица:**') or  # Наши таблицы
-                content_start.startswith('-') or  # Списки
-                content_start.startswith('*') or  # Списки
-                content_start.startswith('+') or  # Списки
-                re.match(r'^\d+\.', content_start))  # Нумерованные списки
+        """
+        Проверяет, является ли содержимое блочным элементом.
+        Проверяется только начало строки, без копирования части через lstrip()
+        """
+        return bool(content) and _BLOCK_START_RE.match(content) is not None
 
     def _process_container(self, container) -> List[str]:
         """
@@ -473,37 +585,35 @@ class ContentExtractor:
         list_items = []
         indent = "    " * indent_level
 
-        if element.name == "ul":
-            markers = ["-", "*", "+"]
-            marker = markers[indent_level % len(markers)]
-        else:
-            marker = None
+        # Префикс маркированного пункта одинаков для всего списка; нумерованные
+        # пункты получают префикс по счетчику
+        is_bulleted = element.name == "ul"
+        bullet_prefix = f"{indent}{_UL_MARKERS[indent_level % len(_UL_MARKERS)]} " if is_bulleted else None
 
         item_counter = 1
 
-        for li in element.find_all("li", recursive=False):
+        for li in _child_tags(element, ("li",)):
             if not self._should_include_element(li):
                 if not self.config.include_colored:
                     black_content = self._extract_black_elements_from_colored_container(li, context)
                     if black_content:
-                        if element.name == "ul":
-                            list_items.append(f"{indent}{marker} {black_content}")
+                        if is_bulleted:
+                            list_items.append(bullet_prefix + black_content)
                         else:
                             list_items.append(f"{indent}{item_counter}. {black_content}")
                             item_counter += 1
                 continue
 
-            item_content = self._process_list_item_content(li, context, indent_level)
+            item_content, nested_lists = self._process_list_item_content(li, context, indent_level)
 
             # ИСПРАВЛЕНО: Проверяем, что содержимое не пустое после trim
             if item_content and item_content.strip():
-                if element.name == "ul":
-                    list_items.append(f"{indent}{marker} {item_content}")
+                if is_bulleted:
+                    list_items.append(bullet_prefix + item_content)
                 else:
                     list_items.append(f"{indent}{item_counter}. {item_content}")
                     item_counter += 1
 
-            nested_lists = li.find_all(["ul", "ol"], recursive=False)
             for nested_list in nested_lists:
                 nested_content = self._process_list(nested_list, context, indent_level + 1)
                 if nested_content:
@@ -516,9 +626,13 @@ class ContentExtractor:
 
         return result
 
-    def _process_list_item_content(self, li: Tag, context: str, indent_level: int) -> str:
-        """Обработка содержимого элемента списка с правильными переводами"""
+    def _process_list_item_content(self, li: Tag, context: str, indent_level: int) -> Tuple[str, List[Tag]]:
+        """
+        Обработка содержимого элемента списка с правильными переводами.
+        Возвращает содержимое и вложенные списки, собранные тем же проходом по дочерним элементам.
+        """
         content_parts = []
+        nested_lists = []
 
         for child in li.children:
             if isinstance(child, NavigableString):
@@ -527,7 +641,7 @@ class ContentExtractor:
                 content_parts.append(processed_text)
             elif isinstance(child, Tag):
                 if child.name in ["ul", "ol"]:
-                    continue
+                    nested_lists.append(child)
                 else:
                     if self._should_include_element(child):
                         child_content = self._process_element(child, context)
@@ -541,7 +655,7 @@ class ContentExtractor:
         result = "".join(content_parts)
         result = result.rstrip('\n')
 
-        return result
+        return result, nested_lists
 
     def _apply_minimal_cleanup(self, content: str) -> str:
         """Применяет только минимальную очистку контента"""
@@ -552,7 +666,7 @@ class ContentExtractor:
 
         if self.config.normalize_spacing:
             content = content.replace('\t', ' ')
-            content = re.sub(r' {4,}', ' ', content)
+            content = _LONG_SPACES_RE.sub(' ', content)
 
         if self.config.clean_brackets:
             content = self._clean_triangular_brackets(content)
@@ -560,23 +674,27 @@ class ContentExtractor:
         return content
 
     def _clean_triangular_brackets(self, content: str) -> str:
-        """Очистка содержимого треугольных скобок"""
-        content = re.sub(r'<\s*([^<>]*?)\s*>', lambda m: f'<{self._clean_bracket_content(m.group(1))}>', content)
-        content = re.sub(r'<\s*>', '<>', content)
-        return content
+        """
+        Очистка содержимого треугольных скобок.
+        Пустые скобки с пробелами ("< >") обрабатываются тем же проходом:
+        _TRIANGULAR_BRACKETS_RE находит их с пустым содержимым и заменяет на "<>".
+        """
+        # Вызывается для результата каждого контейнера, а скобки в тексте редки
+        if '<' not in content:
+            return content
+        return _TRIANGULAR_BRACKETS_RE.sub(lambda m: f'<{self._clean_bracket_content(m.group(1))}>', content)
 
     def _clean_bracket_content(self, content: str) -> str:
         """Умная очистка содержимого треугольных скобок"""
         if not content:
             return ''
 
-        content = content.strip()
-        content = re.sub(r'\s+', ' ', content)
-        content = re.sub(r'"\s+', '"', content)
-        content = re.sub(r'\s+"', '"', content)
-        content = re.sub(r'(\w)"', r'\1 "', content)
-        content = re.sub(r'\[\s+', '[', content)
-        content = re.sub(r'\s+\]', ']', content)
+        # Пробельные последовательности схлопываются в один пробел с обрезкой краев,
+        # поэтому пробелы у кавычек и квадратных скобок дальше убираются простой заменой
+        content = " ".join(content.split())
+        content = content.replace('" ', '"').replace(' "', '"')
+        content = _WORD_BEFORE_QUOTE_RE.sub(r'\1 "', content)
+        content = content.replace('[ ', '[').replace(' ]', ']')
 
         return content
 
@@ -585,20 +703,46 @@ class ContentExtractor:
         if self.config.include_colored:
             return False
 
+        # В документе нет цветных элементов - подниматься по предкам незачем
+        if self._colored_ids is not None and not self._colored_ids:
+            return False
+
+        # Соседние элементы имеют общих предков: ответ запоминается для каждого
+        # пройденного предка, и подъем останавливается на уже проверенном
+        cache = self._colored_chain_cache
+        path = []
+        result = False
         current = element.parent
         while current and isinstance(current, Tag):
+            cached = cache.get(id(current))
+            if cached is not None:
+                result = cached
+                break
             if current.name == "ac:rich-text-body":
                 break
-            if has_colored_style(current):
-                return True
+            path.append(id(current))
+            if self._has_colored_style(current):
+                result = True
+                break
             current = current.parent
-        return False
+
+        for key in path:
+            cache[key] = result
+        return result
+
+    def _process_time(self, element: Tag, context: str) -> str:
+        """Время: значение атрибута datetime, без него - как обычный контейнер"""
+        if element.get("datetime"):
+            return element["datetime"]
+        return self._process_text_container(element, context)
 
     def _process_text_container(self, element: Tag, context: str) -> str:
         """Обработка текстовых контейнеров (div, span)"""
         if element.name == "div":
-            inner_headers = element.find_all(["h1", "h2", "h3", "h4", "h5", "h6"], recursive=False)
-            if inner_headers:
+            # Достаточно первого заголовка среди непосредственных дочерних элементов
+            has_inner_headers = any(isinstance(child, Tag) and child.name in _HEADER_TAGS
+                                    for child in element.children)
+            if has_inner_headers:
                 return self._process_confluence_container(element, context)
 
         return self._process_children(element, context)
@@ -620,10 +764,10 @@ class ContentExtractor:
         ri_page = element.find("ri:page")
         if ri_page and ri_page.get("ri:content-title"):
             link_text = f'[{ri_page["ri:content-title"]}]'
-        elif element.get_text():
-            link_text = f'[{element.get_text()}]'
         else:
-            link_text = ""
+            # Текст ссылки собирается один раз
+            text = element.get_text()
+            link_text = f'[{text}]' if text else ""
 
         return link_text
 
@@ -634,16 +778,10 @@ class ContentExtractor:
         if not link_element.parent:
             return True
 
-        parent = link_element.parent
-        all_children = list(parent.children)
-
-        try:
-            link_index = all_children.index(link_element)
-        except ValueError:
-            return True
-
-        left_status = self._get_neighbor_block_status(all_children, link_index, -1)
-        right_status = self._get_neighbor_block_status(all_children, link_index, 1)
+        # Соседи ищутся обходом братьев от самой ссылки: список детей родителя
+        # не строится, поиск останавливается на ближайшем значимом блоке
+        left_status = self._get_neighbor_block_status(link_element, "previous_sibling")
+        right_status = self._get_neighbor_block_status(link_element, "next_sibling")
 
         # Применяем правила анализа
         if left_status is None and right_status is None:
@@ -658,31 +796,28 @@ class ContentExtractor:
 
         return result
 
-    def _get_neighbor_block_status(self, children: list, start_index: int, direction: int) -> Optional[bool]:
+    def _get_neighbor_block_status(self, element, sibling_attr: str) -> Optional[bool]:
         """
-        Получает статус соседнего блока, пропуская незначимые пробелы
+        Получает статус соседнего блока, пропуская незначимые пробелы.
+        sibling_attr - направление обхода: "previous_sibling" или "next_sibling"
         """
-        step = direction
-        for i in range(start_index + step, len(children) if direction > 0 else -1, step):
-            if direction < 0 and i < 0:
-                break
-
-            child = children[i]
-
+        child = getattr(element, sibling_attr)
+        while child is not None:
             # ИСПРАВЛЕНИЕ: Пропускаем незначимые текстовые узлы
             if isinstance(child, NavigableString):
                 text = str(child).strip()
-                if not text:  # Пустой текст (пробелы, переводы строк) - пропускаем
-                    continue
-                # Значимый текст - анализируем
-                status = False  # Текстовые узлы без стиля = подтвержденные
-                return status
+                if text:
+                    # Значимый текст - текстовые узлы без стиля = подтвержденные
+                    return False
+                # Пустой текст (пробелы, переводы строк) - пропускаем
             else:
                 status = self._get_text_block_color_status(child)
 
                 if status is not None:
                     return status
 
+            child = getattr(child, sibling_attr)
+
         return None
 
     def _get_text_block_color_status(self, element) -> Optional[bool]:
@@ -695,11 +830,11 @@ class ContentExtractor:
             if element.name in ["br", "ac:structured-macro"]:
                 return None
 
-            text_content = element.get_text()
-            if not text_content:
+            # Достаточно первого непустого текстового узла: весь текст блока не собирается
+            if not any(element.strings):
                 return None
 
-            return has_colored_style(element)
+            return self._has_colored_style(element)
 
         return None
 
@@ -727,10 +862,11 @@ class ContentExtractor:
             # и НЕ продолжаем дальнейшую обработку через structural_elements
             return self._process_cell_with_nested_table(element, nested_table, context)
 
-        structural_elements = element.find_all(["h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "div", "p"],
-                                               recursive=False)
+        # Достаточно первого структурного дочернего элемента: проверка останавливается на нем
+        has_structural_elements = any(isinstance(child, Tag) and child.name in _CELL_STRUCTURAL_TAGS
+                                      for child in element.children)
 
-        if len(structural_elements) > 0:
+        if has_structural_elements:
             cell_parts = []
 
             for child in element.children:
@@ -763,8 +899,8 @@ class ContentExtractor:
         """
         result_parts = []
 
-        # ИСПРАВЛЕНИЕ: Собираем весь контент до таблицы, включая из контейнеров
-        text_before = self._extract_content_before_table(cell, nested_table, context)
+        # Контент до и после таблицы собирается за один обход ячейки
+        text_before, text_after = self._split_cell_content_around_table(cell, nested_table, context)
         if text_before:
             result_parts.append(text_before)
 
@@ -773,80 +909,46 @@ class ContentExtractor:
         if nested_html:
             result_parts.append(f"**Таблица:** {nested_html}")
 
-        # ИСПРАВЛЕНИЕ: Собираем весь контент после таблицы
-        text_after = self._extract_content_after_table(cell, nested_table, context)
         if text_after:
             result_parts.append(text_after)
 
         return " ".join(result_parts)
 
-    def _extract_content_before_table(self, cell: Tag, target_table: Tag, context: str) -> str:
+    def _split_cell_content_around_table(self, cell: Tag, target_table: Tag, context: str) -> Tuple[str, str]:
         """
-        НОВЫЙ МЕТОД: Извлекает весь контент ДО таблицы, включая из контейнеров
+        Извлекает весь контент ячейки ДО и ПОСЛЕ таблицы, включая контент из контейнеров.
+        Ячейка обходится один раз: внутрь спускаемся только по контейнерам, содержащим
+        таблицу (они известны заранее по цепочке ее предков), остальные элементы
+        обрабатываются целиком. Другие таблицы пропускаются.
         """
-        result_parts = []
-
-        def extract_until_table(element, target):
-            """Рекурсивно извлекает контент до таблицы"""
-            for child in element.children:
-                # Если нашли целевую таблицу - останавливаемся
-                if child == target:
-                    return True
-
-                if isinstance(child, NavigableString):
-                    text = str(child)
-                    if text:
-                        result_parts.append(text)
-                elif isinstance(child, Tag):
-                    # Если это таблица (но не наша целевая) - пропускаем
-                    if child.name == "table":
-                        continue
-
-                    # Если элемент содержит целевую таблицу - рекурсивно обрабатываем
-                    if child.find(lambda t: t == target):
-                        found = extract_until_table(child, target)
-                        if found:
-                            return True
-                    else:
-                        # Элемент не содержит таблицу - обрабатываем полностью
-                        content = self._process_element(child, context)
-                        if content:
-                            result_parts.append(content)
-
-            return False
-
-        extract_until_table(cell, target_table)
-        return "".join(result_parts)
-
-    def _extract_content_after_table(self, cell: Tag, target_table: Tag, context: str) -> str:
-        """
-        НОВЫЙ МЕТОД: Извлекает весь контент ПОСЛЕ таблицы
-        """
-        result_parts = []
+        before_parts = []
+        after_parts = []
+        table_ancestors = set()
+        parent = target_table.parent
+        while parent is not None and parent is not cell:
+            table_ancestors.add(id(parent))
+            parent = parent.parent
         found_table = False
 
-        def extract_after_table(element, target):
-            """Рекурсивно извлекает контент после таблицы"""
+        def walk(element):
+            """Рекурсивно раскладывает контент по частям до и после таблицы"""
             nonlocal found_table
 
             for child in element.children:
-                # Отмечаем, что нашли целевую таблицу
-                if child == target:
+                if child is target_table:
                     found_table = True
                     continue
 
-                # Если ещё не нашли таблицу
-                if not found_table:
-                    # Если элемент содержит целевую таблицу - рекурсивно ищем
-                    if isinstance(child, Tag) and child.find(lambda t: t == target):
-                        extract_after_table(child, target)
+                # Контейнер с целевой таблицей - спускаемся в него
+                if id(child) in table_ancestors:
+                    walk(child)
                     continue
 
-                # Уже после таблицы - собираем контент
+                parts = after_parts if found_table else before_parts
                 if isinstance(child, NavigableString):
                     text = str(child)
                     if text:
-                        result_parts.append(text)
+                        parts.append(text)
                 elif isinstance(child, Tag):
                     # Если это другая таблица - пропускаем
                     if child.name == "table":
@@ -854,23 +956,18 @@ class ContentExtractor:
 
                     content = self._process_element(child, context)
                     if content:
-                        result_parts.append(content)
+                        parts.append(content)
 
-        extract_after_table(cell, target_table)
-        return "".join(result_parts)
+        walk(cell)
+        return "".join(before_parts), "".join(after_parts)
 
     def _process_nested_table_to_html(self, table: Tag) -> str:
         """
         ИСПРАВЛЕНО: Преобразование вложенной таблицы в HTML с обработкой глубокой вложенности
         """
-        rows = table.find_all("tr", recursive=False)
-        if not rows:
-            tbody = table.find("tbody")
-            thead = table.find("thead")
-            if tbody:
-                rows.extend(tbody.find_all("tr", recursive=False))
-            if thead:
-                rows.extend(thead.find_all("tr", recursive=False))
+        head_rows, body_rows, direct_rows = _table_rows(table)
+        # Строки без секции, иначе строки thead, затем tbody
+        rows = direct_rows or head_rows + body_rows
 
         if not rows:
             return ""
@@ -878,17 +975,13 @@ class ContentExtractor:
         html_parts = ["<table>"]
 
         for row in rows:
-            cells = row.find_all(["td", "th"], recursive=False)
+            cells = _child_tags(row, _TABLE_CELL_TAGS)
             row_parts = ["<tr>"]
 
             for cell in cells:
                 tag_name = "th" if cell.name == "th" else "td"
 
-                attrs = []
-                if cell.get("rowspan") and int(cell.get("rowspan", 1)) > 1:
-                    attrs.append(f'rowspan="{cell["rowspan"]}"')
-                if cell.get("colspan") and int(cell.get("colspan", 1)) > 1:
-                    attrs.append(f'colspan="{cell["colspan"]}"')
+                attrs = _span_attrs(cell)
 
                 attrs_str = " " + " ".join(attrs) if attrs else ""
 
@@ -936,7 +1029,7 @@ class ContentExtractor:
                     nested_html = self._process_nested_table_to_html(child)
                     if nested_html:
                         result_parts.append(nested_html)
-                elif child.name in ["h1", "h2", "h3", "h4", "h5", "h6"]:
+                elif child.name in _HEADER_TAGS:
                     # ДОБАВЛЕНО: Обработка заголовков
                     if self.config.format_headers:
                         level = int(child.name[1])
@@ -1001,11 +1094,11 @@ class ContentExtractor:
                     processed_text = self._process_text_node(text, context)
                     result_parts.append(processed_text)
             elif isinstance(child, Tag):
-                # ВАЖНО: НЕ применяем цветовую фильтрацию, но проверяем игнорируемые
-                if not self._is_ignored_element(child):
-                    child_content = self._process_element_without_color_filter(child, context)
-                    if child_content is not None:
-                        result_parts.append(child_content)
+                # ВАЖНО: НЕ применяем цветовую фильтрацию; игнорируемые элементы
+                # _process_element_without_color_filter пропускает сам
+                child_content = self._process_element_without_color_filter(child, context)
+                if child_content is not None:
+                    result_parts.append(child_content)
 
         result = "".join(result_parts)
 
@@ -1032,15 +1125,12 @@ class ContentExtractor:
             return "\n"
 
         # Обрабатываем элементы БЕЗ цветовых проверок
-        if element.name in ["h1", "h2", "h3", "h4", "h5", "h6"]:
-            return self._process_header_without_color_filter(element, context)
-        elif element.name in ["a", "ac:link"]:
-            return self._process_link(element, context)
-        elif element.name == "p":
-            return self._process_paragraph_without_color_filter(element, context)
-        else:
-            # Для всех остальных элементов - просто обрабатываем детей
-            return self._process_children_without_color_filter(element, context)
+        handler = self._filter_free_handlers.get(element.name)
+        if handler is not None:
+            return handler(element, context)
+
+        # Для всех остальных элементов - просто обрабатываем детей
+        return self._process_children_without_color_filter(element, context)
 
     def _process_header_without_color_filter(self, element: Tag, context: str) -> str:
         """Обработка заголовков БЕЗ цветовой фильтрации"""
@@ -1092,4 +1182,34 @@ def create_approved_fragments_extractor() -> ContentExtractor:
         preserve_whitespace=True,
         normalize_spacing=False
     )
-    return ContentExtractor(config)
\ No newline at end of file
+    return ContentExtractor(config)
+
+
+def extract_all_and_approved_fragments(html: str) -> Tuple[str, str]:
+    """
+    Извлекает все и подтвержденные фрагменты за один разбор HTML.
+    Очистка истории изменений и раскрытие expand-блоков выполняются один раз,
+    после чего оба экстрактора обходят одно и то же дерево.
+    Результат совпадает с парой filter_all_fragments(html), filter_approved_fragments(html).
+    """
+    if not html or not html.strip():
+        return "", ""
+
+    all_extractor = create_all_fragments_extractor()
+    approved_extractor = create_approved_fragments_extractor()
+
+    if _is_plain_text(html):
+        return all_extractor.extract(html), approved_extractor.extract(html)
+
+    soup = _parse_without_history(html)
+    all_extractor._process_expand_blocks(soup)
+
+    all_content = all_extractor.extract_from_soup(soup)
+
+    # Цветные элементы отбираются одним поиском по атрибуту style. Если их нет,
+    # фильтрация по цвету ничего не отбрасывает и подтвержденный контент совпадает с полным
+    colored_ids = approved_extractor._collect_colored_ids(soup)
+    if not colored_ids:
+        return all_content, all_content
+
+    return all_content, approved_extractor.extract_from_soup(soup, colored_ids)
@@ -11,13 +11,15 @@ def filter_all_fragments(html: str) -> str:
     Извлекает все фрагменты из HTML возвращая их с гибридной разметкой (Markdown + HTML)
     без учета цвета элементов
     """
-    logger.info("[filter_all_fragments] <- {%s}", html[:200] + "...")
-    logger.debug("[filter_all_fragments] <- {%s}", html)
+    # %.200s обрезает строку только если сообщение действительно пишется
+    logger.info("[filter_all_fragments] <- {%.200s...}", html)
+    logger.debug("[filter_all_fragments] <- {%.500s...}", html)
 
     extractor = create_all_fragments_extractor()
     result = extractor.extract(html)
 
-    logger.info("[filter_all_fragments] -> {%s}", result)
+    logger.info("[filter_all_fragments] -> %d chars", len(result))
+    logger.debug("[filter_all_fragments] -> {%.500s...}", result)
     return result
 
 
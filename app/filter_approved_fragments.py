@@ -10,12 +10,14 @@ def filter_approved_fragments(html: str) -> str:
     """
     Извлекает подтвержденные фрагменты с гибридной разметкой (Markdown + HTML)
     """
-    logger.info("[filter_approved_fragments] <- {%s}", html[:200] + "...")
+    # %.200s обрезает строку только если сообщение действительно пишется
+    logger.info("[filter_approved_fragments] <- {%.200s...}", html)
 
     extractor = create_approved_fragments_extractor()
     result = extractor.extract(html)
 
-    logger.info("[filter_approved_fragments] -> {%s}", result)
+    logger.info("[filter_approved_fragments] -> %d chars", len(result))
+    logger.debug("[filter_approved_fragments] -> {%.500s...}", result)
     return result
 
 def test_filter_approved_fragments():
@@ -1,8 +1,6 @@
 # app/history_cleaner.py
 
 import logging
-import re
-from typing import Optional
 from bs4 import BeautifulSoup, Tag, NavigableString
 
 logger = logging.getLogger(__name__)
@@ -30,6 +28,24 @@ def remove_history_sections(html_content: str) -> str:
     logger.debug("[remove_history_sections] <- html length: %d", len(html_content))
 
     soup = BeautifulSoup(html_content, 'html.parser')
+    removed_sections = remove_history_sections_from_soup(soup)
+
+    cleaned_html = str(soup)
+
+    logger.info("[remove_history_sections] -> Removed %d history sections, cleaned length: %d",
+                removed_sections, len(cleaned_html))
+
+    return cleaned_html
+
+
+def remove_history_sections_from_soup(soup: BeautifulSoup) -> int:
+    """
+    Удаляет разделы "История изменений" непосредственно в разобранном дереве.
+    Позволяет очистить документ без повторной сериализации и разбора HTML.
+
+    Returns:
+        Количество удаленных разделов
+    """
     removed_sections = 0
 
     # 1. УДАЛЯЕМ EXPAND БЛОКИ С "ИСТОРИЯ ИЗМЕНЕНИЙ"
@@ -44,12 +60,7 @@ def remove_history_sections(html_content: str) -> str:
     # 4. УДАЛЯЕМ ТАБЛИЦЫ С ХАРАКТЕРНЫМИ ЗАГОЛОВКАМИ ИСТОРИИ
     removed_sections += _remove_history_tables_by_headers(soup)
 
-    cleaned_html = str(soup)
-
-    logger.info("[remove_history_sections] -> Removed %d history sections, cleaned length: %d",
-                removed_sections, len(cleaned_html))
-
-    return cleaned_html
+    return removed_sections
 
 
 def _remove_expand_history_blocks(soup: BeautifulSoup) -> int:
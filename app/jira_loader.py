@@ -6,16 +6,25 @@ import logging
 import re
 from typing import List, Optional
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from app.config import (
     JIRA_BASE_URL,
     JIRA_USER,
     JIRA_API_TOKEN,
     JIRA_PASSWORD
 )
+from app.utils.html_utils import parse_html
 
 logger = logging.getLogger(__name__)
 
+# Для поиска страниц в описании задачи нужны только ссылки
+_LINKS_STRAINER = SoupStrainer('a', href=True)
+
+# Шаблоны поиска страниц Confluence компилируются один раз при импорте модуля
+_TEXT_PAGE_ID_RE = re.compile(r'pageId[=:]\s*(\d+)', re.IGNORECASE)
+_URL_PAGE_ID_RE = re.compile(r'[?&]pageId=(\d+)')
+_SHORT_LINK_RE = re.compile(r'/x/([A-Za-z0-9]+)')
+
 
 def _get_jira_auth():
     """
@@ -169,8 +178,8 @@ def _extract_confluence_page_ids_from_html(html_content: str) -> List[str]:
 
     page_ids = []
 
-    # Парсим HTML с помощью BeautifulSoup
-    soup = BeautifulSoup(html_content, 'html.parser')
+    # Парсим HTML тем же парсером (lxml), что и страницы Confluence; в дерево попадают только ссылки
+    soup = parse_html(html_content, parse_only=_LINKS_STRAINER)
 
     # Ищем все ссылки
     links = soup.find_all('a', href=True)
@@ -183,8 +192,7 @@ def _extract_confluence_page_ids_from_html(html_content: str) -> List[str]:
             page_ids.append(page_id)
 
     # Также ищем pageId в обычном тексте (на случай если ссылки не в тегах <a>)
-    page_id_pattern = r'pageId[=:]\s*(\d+)'
-    text_matches = re.findall(page_id_pattern, html_content, re.IGNORECASE)
+    text_matches = _TEXT_PAGE_ID_RE.findall(html_content)
     page_ids.extend(text_matches)
 
     # Удаляем дубликаты и возвращаем
@@ -199,13 +207,13 @@ def _extract_page_id_from_url(url: str) -> Optional[str]:
         return None
 
     # Паттерн для поиска pageId в параметрах URL
-    page_id_match = re.search(r'[?&]pageId=(\d+)', url)
+    page_id_match = _URL_PAGE_ID_RE.search(url)
     if page_id_match:
         return page_id_match.group(1)
 
     # Паттерн для коротких ссылок вида /x/ABC123
     # Пока не реализовано разрешение коротких ссылок
-    short_link_match = re.search(r'/x/([A-Za-z0-9]+)', url)
+    short_link_match = _SHORT_LINK_RE.search(url)
     if short_link_match:
         logger.debug("[_extract_page_id_from_url] Found short link that needs resolution: %s", url)
         # TODO: Implement short link resolution if needed
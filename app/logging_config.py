@@ -94,4 +94,4 @@ def setup_logging():
     logging.getLogger('langchain').setLevel(logging.WARNING)
     logging.getLogger('openai').setLevel(logging.WARNING)
 
-    logger.info(f"Logging configured: level=INFO, max_message_length={MAX_CHARS_SIZE} chars")
\ No newline at end of file
+    logger.info("Logging configured: level=INFO, max_message_length=%d chars", MAX_CHARS_SIZE)
\ No newline at end of file
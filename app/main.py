@@ -1,9 +1,14 @@
 # app/main.py - обновленная версия
 
+from contextlib import asynccontextmanager
+
+import anyio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.config import ANYIO_THREAD_TOKENS
 from app.embedding_store import get_embedding_model
 from app.logging_config import setup_logging
+from app.page_cache import shutdown_processing_pool
 from app.routes import (analyze, loader, info, services, health, test_context,
                         logging_control, jira, template_analysis, extractor, summary, storage, config_endpoint)
 
@@ -13,10 +18,22 @@ setup_logging()
 import logging
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Лимитер потоков anyio привязан к циклу событий, поэтому настраивается при старте, а не при импорте
+    anyio.to_thread.current_default_thread_limiter().total_tokens = ANYIO_THREAD_TOKENS
+    logger.info("anyio thread limiter set to %d tokens", ANYIO_THREAD_TOKENS)
+    yield
+    # Процессы обработки страниц не должны переживать приложение
+    shutdown_processing_pool()
+
+
 app = FastAPI(
     title="AI Requirements Analyzer",
     description="Анализ и проверка требований на основе контекста и шаблонов",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 logger.info("Starting Requirements Analyzer application")
@@ -60,7 +77,7 @@ try:
     import chromadb
 
     chroma_version = chromadb.__version__
-    logger.info(f"ChromaDB version: {chroma_version}")
+    logger.info("ChromaDB version: %s", chroma_version)
 
     # Предупреждение для проблемных версий
     if chroma_version.startswith("0.4.") or chroma_version.startswith("0.5."):
@@ -1,9 +1,20 @@
 # app/models.py
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Literal
 
 
+# Общая конфигурация DTO маршрутов: лишние поля отбрасываются, модели неизменяемы,
+# схема валидации собирается сразу при импорте, а не на первом запросе
+DTO_CONFIG = ConfigDict(
+    extra="ignore",
+    frozen=True,
+    validate_assignment=False,
+    arbitrary_types_allowed=False,
+    defer_build=False,
+)
+
+
 class AnalyzeRequest(BaseModel):
     page_ids: List[str]
     top_k: int = 5
@@ -1,88 +1,117 @@
 # app/page_cache.py
 
+import hashlib
 import logging
+import multiprocessing
 import time
 import threading
-from typing import Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Dict, List, Optional
 from requests.exceptions import ConnectionError, RequestException
 from http.client import RemoteDisconnected
 
-import markdownify
-from cachetools import TTLCache
+from cachetools import TTLCache, LRUCache
 from cachetools.keys import hashkey
 
-from app.config import PAGE_CACHE_SIZE, PAGE_CACHE_TTL
-from app.confluence_loader import confluence, extract_approved_fragments
-from app.filter_all_fragments import filter_all_fragments
-from app.services.template_type_analysis import analyze_content_template_type
+from app.config import PAGE_CACHE_SIZE, PAGE_CACHE_TTL, PAGE_PROCESSING_WORKERS, PROCESSED_CACHE_SIZE
+from app.confluence_client import get_confluence
+from app.content_extractor import extract_all_and_approved_fragments
+from app.utils.markdown_utils import html_to_markdown
+from app.services.template_type_analysis import analyze_text_template_type
 
 logger = logging.getLogger(__name__)
 
 # Создаем TTL кэш: максимум PAGE_CACHE_SIZE элементов, время жизни PAGE_CACHE_TTL секунд
 page_cache = TTLCache(maxsize=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL)
+# Обработанные данные по (page_id, номер версии страницы). Переживают истечение TTL:
+# страница, не менявшаяся с прошлой загрузки, запрашивается заново, но HTML повторно не обрабатывается.
+# Хранятся только результаты обработки и хеш заголовка и HTML, без самого HTML
+processed_cache = LRUCache(maxsize=PROCESSED_CACHE_SIZE)
 cache_lock = threading.RLock()
+# Блокировки загрузки по ключу кеша: одна загрузка страницы одновременно.
+# Значение - [блокировка, число потоков, использующих ее]
+_page_locks: Dict = {}
 
 # Константы для retry-логики
 MAX_RETRIES = 3
 INITIAL_BACKOFF = 1  # секунды
 MAX_BACKOFF = 8  # секунды
 
+# Число страниц в одном CQL-запросе пакетной загрузки
+CQL_BATCH_SIZE = 50
+
 
 def _reconnect_confluence():
     """
     Переинициализация соединения с Confluence.
-    Закрывает текущую сессию и создает новую.
+    Закрывает соединения пула общей сессии: следующие запросы откроют новые keep-alive
+    соединения. Сама сессия (авторизация, заголовки, адаптер с размером пула) сохраняется.
     """
+    confluence = get_confluence()
     try:
-        if hasattr(confluence, 'session') and confluence.session:
-            logger.debug("[_reconnect_confluence] Closing existing session")
-            confluence.session.close()
-
-        # Если у confluence есть метод переинициализации, используем его
-        if hasattr(confluence, 'reinit_session'):
-            confluence.reinit_session()
-        elif hasattr(confluence, '_create_session'):
-            confluence._create_session()
-        else:
-            # В противном случае просто создаем новую сессию
-            import requests
-            from requests.adapters import HTTPAdapter
-            from urllib3.util.retry import Retry
-
-            confluence.session = requests.Session()
-
-            # Настройка retry strategy
-            retry_strategy = Retry(
-                total=2,
-                backoff_factor=1,
-                status_forcelist=[429, 500, 502, 503, 504],
-                allowed_methods=["HEAD", "GET", "OPTIONS", "POST"]
-            )
+        logger.debug("[_reconnect_confluence] Closing pooled connections")
+        confluence.session.close()
+        logger.info("[_reconnect_confluence] Session reconnected successfully")
+    except Exception as e:
+        logger.warning("[_reconnect_confluence] Failed to reconnect: %s", str(e))
 
-            adapter = HTTPAdapter(
-                max_retries=retry_strategy,
-                pool_connections=10,
-                pool_maxsize=20,
-                pool_block=False
-            )
 
-            confluence.session.mount("https://", adapter)
-            confluence.session.mount("http://", adapter)
+def _process_page_html(title: str, raw_html: str) -> Dict:
+    """
+    Вся CPU-обработка HTML страницы: полный и подтвержденный контент (из одного
+    разбора), Markdown и тип шаблона (по уже извлеченному полному контенту).
+    Функция модульного уровня, чтобы ее можно было выполнить в процессе пула.
+    """
+    full_content, approved_content = extract_all_and_approved_fragments(raw_html)
+    return {
+        'full_content': full_content,
+        'full_markdown': html_to_markdown(raw_html),
+        'approved_content': approved_content,
+        'requirement_type': analyze_text_template_type(title, full_content)
+    }
 
-            # Keep-alive headers
-            if not hasattr(confluence.session, 'headers'):
-                confluence.session.headers = {}
-            confluence.session.headers.update({
-                'Connection': 'keep-alive'
-            })
 
-            logger.info("[_reconnect_confluence] Session reconnected successfully")
+@lru_cache(maxsize=1)
+def _get_processing_pool() -> ProcessPoolExecutor:
+    """
+    Пул процессов для обработки HTML, создается при первом обращении.
+    Обработка упирается в GIL, поэтому параллельно загружаемые страницы обрабатываются
+    в отдельных процессах. spawn вместо fork: сервис многопоточный.
+    """
+    logger.info("[_get_processing_pool] Starting %d page processing worker(s)", PAGE_PROCESSING_WORKERS)
+    return ProcessPoolExecutor(max_workers=PAGE_PROCESSING_WORKERS,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+def _process_in_pool(title: str, raw_html: str) -> Dict:
+    """
+    Обрабатывает HTML в пуле процессов. Пул, сломанный падением процесса
+    (например, OOM на большой странице), пересоздается для следующих страниц,
+    а эта страница обрабатывается в текущем потоке.
+    """
+    pool = _get_processing_pool()
+    try:
+        return pool.submit(_process_page_html, title, raw_html).result()
+    except BrokenProcessPool as e:
+        logger.warning("[_process_in_pool] Processing pool is broken, restarting: %s", str(e))
+        # Пул сбрасывается один раз: другой поток мог уже создать новый
+        with cache_lock:
+            if _get_processing_pool() is pool:
+                _get_processing_pool.cache_clear()
+        return _process_page_html(title, raw_html)
 
-    except Exception as e:
-        logger.warning("[_reconnect_confluence] Failed to reconnect: %s", str(e))
 
+def shutdown_processing_pool() -> None:
+    """Останавливает пул процессов обработки HTML, если он был создан"""
+    if _get_processing_pool.cache_info().currsize:
+        _get_processing_pool().shutdown(wait=False, cancel_futures=True)
+        _get_processing_pool.cache_clear()
+        logger.info("[shutdown_processing_pool] Page processing pool shut down")
 
-def get_page_data_cached(page_id: str) -> Optional[Dict]:
+
+def get_page_data_cached(page_id: str, page: Optional[Dict] = None) -> Optional[Dict]:
     """
     Кешированная функция для получения всех данных страницы за один запрос.
 
@@ -92,6 +121,8 @@ def get_page_data_cached(page_id: str) -> Optional[Dict]:
 
     Args:
         page_id: Идентификатор страницы
+        page: Уже полученный ответ Confluence (пакетная загрузка), при промахе кеша
+              обрабатывается без отдельного запроса
 
     Returns:
         Словарь с полными данными страницы или None при ошибке
@@ -110,49 +141,113 @@ def get_page_data_cached(page_id: str) -> Optional[Dict]:
 
     logger.debug("[get_page_data_cached] Cache MISS for page_id=%s", page_id)
 
+    # Страница загружается одним потоком: параллельные запросы той же страницы
+    # (дубликаты в одном списке, одновременные запросы) дожидаются результата из кеша
+    with cache_lock:
+        lock_entry = _page_locks.get(cache_key)
+        if lock_entry is None:
+            lock_entry = _page_locks[cache_key] = [threading.Lock(), 0]
+        lock_entry[1] += 1
+
+    try:
+        with lock_entry[0]:
+            with cache_lock:
+                if cache_key in page_cache:
+                    logger.debug("[get_page_data_cached] Cache HIT after wait for page_id=%s", page_id)
+                    return page_cache[cache_key]
+            if page is not None:
+                return _process_prefetched_page(page_id, cache_key, page)
+            return _fetch_page_data(page_id, cache_key)
+    finally:
+        # Блокировка удаляется последним использующим ее потоком: иначе поток,
+        # пришедший позже, создал бы новую и загрузил страницу параллельно ожидающим
+        with cache_lock:
+            lock_entry[1] -= 1
+            if not lock_entry[1]:
+                del _page_locks[cache_key]
+
+
+def _content_hash(title: str, raw_html: str) -> str:
+    """Хеш заголовка и HTML страницы для проверки, что версия действительно не изменилась"""
+    digest = hashlib.sha256(title.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(raw_html.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _build_page_data(page_id: str, cache_key, page: Dict) -> Optional[Dict]:
+    """Обрабатывает полученную из Confluence страницу, успешный результат кладет в кеш"""
+    if not page:
+        logger.warning("[get_page_data_cached] Page not found: %s", page_id)
+        return None
+
+    title = page.get('title', '')
+    raw_html = page.get('body', {}).get('storage', {}).get('value', '')
+
+    if not raw_html:
+        logger.warning("[get_page_data_cached] No content found for page_id=%s", page_id)
+        return None
+
+    # Версия не изменилась - берем уже обработанные данные. Сравнение хеша содержимого
+    # страхует от ответа без номера версии
+    version_key = (page_id, page.get('version', {}).get('number'))
+    content_hash = _content_hash(title, raw_html)
+    with cache_lock:
+        cached = processed_cache.get(version_key)
+        if cached is not None and cached[0] == content_hash:
+            result = {'id': page_id, 'title': title, 'raw_html': raw_html, **cached[1]}
+            page_cache[cache_key] = result
+            logger.debug("[get_page_data_cached] -> Version %s unchanged, reused processed page_id=%s",
+                         version_key[1], page_id)
+            return result
+
+    # Все виды обработки HTML выполняем один раз
+    if PAGE_PROCESSING_WORKERS > 0:
+        processed = _process_in_pool(title, raw_html)
+    else:
+        processed = _process_page_html(title, raw_html)
+
+    result = {
+        'id': page_id,
+        'title': title,
+        'raw_html': raw_html,
+        **processed
+    }
+
+    # ТОЛЬКО успешные результаты кешируем
+    with cache_lock:
+        page_cache[cache_key] = result
+        processed_cache[version_key] = (content_hash, processed)
+
+    logger.debug("[get_page_data_cached] -> Processed and CACHED page: title='%s', type='%s'",
+                 title, result['requirement_type'])
+    return result
+
+
+def _process_prefetched_page(page_id: str, cache_key, page: Dict) -> Optional[Dict]:
+    """Обрабатывает страницу из пакетной загрузки, при ошибке обработки возвращает None"""
+    try:
+        return _build_page_data(page_id, cache_key, page)
+    except Exception as e:
+        logger.error("[get_page_data_cached] Error processing page_id=%s: %s", page_id, str(e))
+        return None  # НЕ кешируем ошибки
+
+
+def _fetch_page_data(page_id: str, cache_key) -> Optional[Dict]:
+    """Загружает и обрабатывает страницу с retry-механизмом, успешный результат кладет в кеш"""
     # Загружаем данные с retry-механизмом
     last_error = None
     backoff = INITIAL_BACKOFF
 
     for attempt in range(MAX_RETRIES):
         try:
-            # Единственный запрос к Confluence API
-            page = confluence.get_page_by_id(page_id, expand='body.storage,title')
+            # Единственный запрос к Confluence API (заголовок возвращается всегда)
+            page = get_confluence().get_page_by_id(page_id, expand='body.storage,version')
 
-            if not page:
-                logger.warning("[get_page_data_cached] Page not found: %s", page_id)
+            result = _build_page_data(page_id, cache_key, page)
+            if result is None:
                 return None  # НЕ кешируем None
 
-            title = page.get('title', '')
-            raw_html = page.get('body', {}).get('storage', {}).get('value', '')
-
-            if not raw_html:
-                logger.warning("[get_page_data_cached] No content found for page_id=%s", page_id)
-                return None  # НЕ кешируем None
-
-            # Все виды обработки HTML выполняем один раз
-            full_content = filter_all_fragments(raw_html)
-            full_markdown = markdownify.markdownify(raw_html, heading_style="ATX")
-            approved_content = extract_approved_fragments(raw_html)
-            requirement_type = analyze_content_template_type(title, raw_html)
-
-            result = {
-                'id': page_id,
-                'title': title,
-                'raw_html': raw_html,
-                'full_content': full_content,
-                'full_markdown': full_markdown,
-                'approved_content': approved_content,
-                'requirement_type': requirement_type
-            }
-
-            # ТОЛЬКО успешные результаты кешируем
-            with cache_lock:
-                page_cache[cache_key] = result
-
-            logger.debug("[get_page_data_cached] -> Processed and CACHED page: title='%s', type='%s'",
-                         title, requirement_type)
-
             # Если были повторные попытки, логируем успех
             if attempt > 0:
                 logger.info(
@@ -202,10 +297,72 @@ def get_page_data_cached(page_id: str) -> Optional[Dict]:
     return None  # НЕ кешируем ошибки
 
 
+def _search_pages_batch(page_ids: List[str]) -> List[Dict]:
+    """
+    Один CQL-запрос `id in (...)` с содержимым и версией страниц, с тем же
+    retry-механизмом, что и при загрузке одной страницы.
+    При неустранимой ошибке возвращает пустой список.
+    """
+    cql = f"id in ({','.join(page_ids)})"
+    backoff = INITIAL_BACKOFF
+
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = get_confluence().cql(cql, limit=len(page_ids), excerpt="none",
+                                             expand="content.body.storage,content.version")
+            return [item["content"] for item in response.get("results", []) if item.get("content")]
+        except (ConnectionError, RemoteDisconnected, RequestException) as e:
+            if attempt < MAX_RETRIES - 1:
+                logger.warning(
+                    "[prefetch_pages] Connection error for batch of %d pages "
+                    "(attempt %d/%d): %s. Retrying in %ds...",
+                    len(page_ids), attempt + 1, MAX_RETRIES, str(e), backoff
+                )
+                _reconnect_confluence()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+            else:
+                logger.error("[prefetch_pages] Failed to retrieve batch of %d pages after %d attempts: %s",
+                             len(page_ids), MAX_RETRIES, str(e))
+        except Exception as e:
+            logger.error("[prefetch_pages] CQL batch request failed: %s", str(e))
+            break
+    return []
+
+
+def prefetch_pages(page_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Пакетно запрашивает отсутствующие в кеше страницы CQL-поиском по id:
+    один запрос на CQL_BATCH_SIZE страниц вместо отдельного запроса на каждую.
+    Возвращает ответы Confluence по идентификатору страницы для передачи в
+    get_page_data_cached. Страницы, не попавшие в результат (ошибка запроса, нет
+    прав, нечисловой идентификатор), загружаются затем по одной.
+    """
+    # В CQL подставляются только идентификаторы из цифр ASCII: isdigit() пропускает
+    # и другие цифры Unicode ('²', '٣'), на которых падает запрос всего пакета
+    with cache_lock:
+        missing = [page_id for page_id in dict.fromkeys(page_ids)
+                   if page_id.isascii() and page_id.isdigit() and hashkey(page_id) not in page_cache]
+
+    # Одну страницу дешевле запросить напрямую
+    if len(missing) < 2:
+        return {}
+
+    pages = {}
+    for start in range(0, len(missing), CQL_BATCH_SIZE):
+        for page in _search_pages_batch(missing[start:start + CQL_BATCH_SIZE]):
+            pages[str(page.get("id"))] = page
+
+    logger.info("[prefetch_pages] -> Prefetched %d of %d missing pages in %d CQL request(s)",
+                len(pages), len(missing), -(-len(missing) // CQL_BATCH_SIZE))
+    return pages
+
+
 def clear_page_cache():
     """Очистка кеша страниц"""
     with cache_lock:
         page_cache.clear()
+        processed_cache.clear()
     logger.info("[clear_page_cache] Page cache cleared")
 
 
@@ -213,11 +370,14 @@ def get_cache_info():
     """Информация о состоянии кеша"""
     with cache_lock:
         current_size = len(page_cache)
+        processed_size = len(processed_cache)
 
-    logger.info("[get_cache_info] Cache stats: size=%d, max_size=%d",
-                current_size, PAGE_CACHE_SIZE)
+    logger.info("[get_cache_info] Cache stats: size=%d, max_size=%d, processed_size=%d, processed_max_size=%d",
+                current_size, PAGE_CACHE_SIZE, processed_size, PROCESSED_CACHE_SIZE)
     return {
         'current_size': current_size,
         'max_size': PAGE_CACHE_SIZE,
-        'ttl': PAGE_CACHE_TTL
+        'ttl': PAGE_CACHE_TTL,
+        'processed_size': processed_size,
+        'processed_max_size': PROCESSED_CACHE_SIZE
     }
\ No newline at end of file
@@ -1,20 +1,34 @@
 # app/rag_pipeline.py
 
 import logging
+import re
 from typing import Optional, List
 import tiktoken
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from langchain_core.prompts import PromptTemplate
 from langchain.chains.llm import LLMChain
 from app.config import TEMPLATE_ANALYSIS_PROMPT_FILE, PAGE_ANALYSIS_PROMPT_FILE
-from app.confluence_loader import get_page_content_by_id, extract_approved_fragments
+from app.utils.html_utils import parse_html
 from app.llm_interface import get_llm
-from app.utils.style_utils import has_colored_style
+from app.utils.style_utils import has_colored_style, STYLE_WITH_COLOR_RE
 
 # ИСПРАВЛЕНО: Убрали глобальную инициализацию LLM
 # llm = get_llm()  # <-- УДАЛЕНО!
 logger = logging.getLogger(__name__)
 
+# Блоки, внутри которых ищутся ссылки на страницы Confluence
+LINK_CONTAINER_TAGS = ["p", "li", "span", "div", "td", "th"]
+# При разборе строятся только эти блоки с содержимым: таблицы, заголовки, макросы
+# вне них в дерево не попадают
+_LINK_CONTAINERS_STRAINER = SoupStrainer(LINK_CONTAINER_TAGS)
+# Форматы URL страниц Confluence с идентификатором страницы, в порядке проверки
+PAGE_LINK_PATTERNS = [
+    re.compile(r'pageId=(\d+)'),
+    re.compile(r'/pages/viewpage\.action\?pageId=(\d+)'),
+    re.compile(r'/display/[^/]+/[^?]*\?pageId=(\d+)'),
+    re.compile(r'/wiki/spaces/[^/]+/pages/(\d+)/')
+]
+
 
 def build_chain(prompt_template: Optional[str]) -> LLMChain:
     """Создает цепочку LangChain с заданным шаблоном промпта."""
@@ -62,14 +76,19 @@ def _extract_links_from_unconfirmed_fragments(html_content: str, exclude_page_id
     Returns:
         Список уникальных page_id найденных ссылок
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = parse_html(html_content, parse_only=_LINK_CONTAINERS_STRAINER)
     found_page_ids = set()
     exclude_set = set(exclude_page_ids)
 
-    for element in soup.find_all(["p", "li", "span", "div", "td", "th"]):
-        # Если include_all=False, пропускаем элементы без цветного стиля (черные)
-        if not include_all and not has_colored_style(element):
-            continue
+    if include_all:
+        elements = soup.find_all(LINK_CONTAINER_TAGS)
+    else:
+        # Цветными могут быть только элементы, в style которых есть "color":
+        # остальные отсекаются при поиске, без вызова проверки для каждого блока
+        elements = [element for element in soup.find_all(LINK_CONTAINER_TAGS, style=STYLE_WITH_COLOR_RE)
+                    if has_colored_style(element)]
+
+    for element in elements:
 
         element_links = _extract_confluence_links_from_element(element)
         for linked_page_id in element_links:
@@ -81,21 +100,13 @@ def _extract_links_from_unconfirmed_fragments(html_content: str, exclude_page_id
 
 def _extract_confluence_links_from_element(element) -> List[str]:
     """Извлекает все ссылки на страницы Confluence из конкретного элемента."""
-    import re
     page_ids = []
 
     # 1. Обычные HTML ссылки с pageId в URL
     for link in element.find_all('a', href=True):
         href = link['href']
-        patterns = [
-            r'pageId=(\d+)',
-            r'/pages/viewpage\.action\?pageId=(\d+)',
-            r'/display/[^/]+/[^?]*\?pageId=(\d+)',
-            r'/wiki/spaces/[^/]+/pages/(\d+)/'
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, href)
+        for pattern in PAGE_LINK_PATTERNS:
+            match = pattern.search(href)
             if match:
                 page_ids.append(match.group(1))
                 break
@@ -118,11 +129,17 @@ def _extract_confluence_links_from_element(element) -> List[str]:
 
 
 def _get_approved_content_cached(page_id: str) -> Optional[str]:
-    """Кешированное получение подтвержденного контента"""
+    """
+    Кешированное получение подтвержденного контента.
+    Подтвержденные фрагменты уже извлечены при загрузке страницы в кеш,
+    поэтому HTML страницы повторно не разбирается.
+    """
+    from app.page_cache import get_page_data_cached
+
     try:
-        html_content = get_page_content_by_id(page_id, clean_html=False)
-        if html_content:
-            approved_content = extract_approved_fragments(html_content)
+        page_data = get_page_data_cached(page_id)
+        if page_data:
+            approved_content = page_data['approved_content']
             return approved_content.strip() if approved_content else None
     except Exception as e:
         logger.error("[_get_approved_content_cached] Error loading page_id=%s: %s", page_id, str(e))
@@ -1,39 +1,64 @@
 # app/routes/analyze.py - ИСПРАВЛЕННАЯ ВЕРСИЯ с параллельностью
 
 from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from typing import List, Optional, Iterable, Iterator
 import logging
+import orjson
 import anyio  # pip install anyio
 from anyio import to_thread
 
-from app.services.analysis_service import analyze_text, analyze_pages, analyze_with_templates
+from app.models import DTO_CONFIG
+from app.utils.orjson_route import ORJSONRoute
+from app.services.analysis_service import (analyze_text, analyze_pages, analyze_with_templates,
+                                           iter_analyze_with_templates)
 from app.service_registry import is_valid_service
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse, route_class=ORJSONRoute)
 
 
 class AnalyzeTextRequest(BaseModel):
+    model_config = DTO_CONFIG
+
     text: str
     prompt_template: Optional[str] = None
     service_code: Optional[str] = None
 
 
 class AnalyzePagesRequest(BaseModel):
+    model_config = DTO_CONFIG
+
     page_ids: List[str]
     prompt_template: Optional[str] = None
     service_code: Optional[str] = None
     check_templates: bool = False
 
 
+class AnalyzeWithTemplatesItem(BaseModel):
+    """Требование для анализа: страница и тип ее шаблона"""
+    model_config = DTO_CONFIG
+
+    requirement_type: str
+    page_id: str
+
+
 class AnalyzeWithTemplatesRequest(BaseModel):
-    items: List[dict]  # Each item: {"requirement_type": str, "page_id": str}
+    model_config = DTO_CONFIG
+
+    items: List[AnalyzeWithTemplatesItem]
     prompt_template: Optional[str] = None
     service_code: Optional[str] = None
 
 
+# Сервис работает со словарями: адаптер строится один раз при импорте модуля
+_ITEM_LIST_ADAPTER = TypeAdapter(List[AnalyzeWithTemplatesItem])
+
+
 class AnalyzeServicePagesRequest(BaseModel):
+    model_config = DTO_CONFIG
+
     page_ids: List[str]
     prompt_template: Optional[str] = None
     check_templates: bool = False
@@ -57,7 +82,7 @@ async def analyze_from_text(payload: AnalyzeTextRequest):
         return {"result": result}
     except Exception as e:
         logger.exception("Ошибка в /analyze")
-        return {"error": str(e)}
+        return ORJSONResponse({"error": str(e)})
 
 
 @router.post("/analyze_pages", tags=["Анализ существующих (ранее) требований сервиса"])
@@ -76,10 +101,11 @@ async def analyze_service_pages(payload: AnalyzePagesRequest):
             payload.check_templates
         )
         logger.info("/analyze_pages -> %d results", len(result) if isinstance(result, list) else 1)
-        return {"results": result}
+        # Результат сервиса уже JSON-совместим: отдаем его напрямую, минуя jsonable_encoder
+        return ORJSONResponse({"results": result})
     except Exception as e:
         logger.exception("Ошибка в /analyze_pages")
-        return {"error": str(e)}
+        return ORJSONResponse({"error": str(e)})
 
 
 @router.post("/analyze_service_pages/{code}", tags=["Анализ существующих (ранее) требований конкретного сервиса"])
@@ -91,7 +117,7 @@ async def analyze_specific_service_pages(code: str, payload: AnalyzeServicePages
     logger.info("/analyze_service_pages/%s <- %d page(s)", code, len(payload.page_ids))
 
     if not is_valid_service(code):
-        return {"error": f"Сервис с кодом {code} не найден"}
+        return ORJSONResponse({"error": f"Сервис с кодом {code} не найден"})
 
     try:
         #  ИСПРАВЛЕНО: Передаем аргументы позиционно
@@ -103,10 +129,10 @@ async def analyze_specific_service_pages(code: str, payload: AnalyzeServicePages
             payload.check_templates
         )
         logger.info("/analyze_service_pages/%s -> %d results", code, len(result) if isinstance(result, list) else 1)
-        return {"results": result}
+        return ORJSONResponse({"results": result})
     except Exception as e:
         logger.exception("Ошибка в /analyze_service_pages/%s", code)
-        return {"error": str(e)}
+        return ORJSONResponse({"error": str(e)})
 
 
 @router.post("/analyze_with_templates", tags=["Анализ новых требований сервиса и их оформления"])
@@ -127,12 +153,40 @@ async def analyze_with_templates_route(payload: AnalyzeWithTemplatesRequest):
         #  ИСПРАВЛЕНО: Передаем аргументы позиционно
         result = await anyio.to_thread.run_sync(
             analyze_with_templates,
-            payload.items,
+            _ITEM_LIST_ADAPTER.dump_python(payload.items),
             payload.prompt_template,
             payload.service_code
         )
         logger.info("[analyze_with_templates] -> %d results", len(result))
-        return {"results": result}
+        return ORJSONResponse({"results": result})
     except Exception as e:
         logger.exception("Ошибка в /analyze_with_templates")
-        return {"error": str(e)}
\ No newline at end of file
+        return ORJSONResponse({"error": str(e)})
+
+
+def _ndjson_lines(results: Iterable[dict]) -> Iterator[bytes]:
+    """Сериализует результаты в NDJSON; ошибка посреди потока отдается последней строкой"""
+    try:
+        for result in results:
+            yield orjson.dumps(result) + b"\n"
+    except Exception as e:
+        logger.exception("Ошибка в /analyze_with_templates/stream")
+        yield orjson.dumps({"error": str(e)}) + b"\n"
+
+
+@router.post("/analyze_with_templates/stream", tags=["Анализ новых требований сервиса и их оформления"])
+async def analyze_with_templates_stream_route(payload: AnalyzeWithTemplatesRequest):
+    """
+    Потоковый вариант /analyze_with_templates.
+
+    Возвращает результаты в формате NDJSON (application/x-ndjson): по одной JSON-строке
+    на требование сразу после его анализа, не дожидаясь обработки всего списка.
+    Синхронный генератор сервиса StreamingResponse выполняет в пуле потоков.
+    """
+    logger.info("[analyze_with_templates_stream] <- %d item(s)", len(payload.items))
+    results = iter_analyze_with_templates(
+        _ITEM_LIST_ADAPTER.dump_python(payload.items),
+        payload.prompt_template,
+        payload.service_code
+    )
+    return StreamingResponse(_ndjson_lines(results), media_type="application/x-ndjson")
@@ -125,6 +125,13 @@ def reload_config_module() -> None:
         except Exception as cache_err:
             logger.warning("Failed to clear embeddings cache: %s", str(cache_err))
 
+        # Реестр сервисов кешируется при первом чтении: перечитываем services.json
+        try:
+            from app.service_registry import reload_services
+            reload_services()
+        except Exception as registry_err:
+            logger.warning("Failed to reload services registry: %s", str(registry_err))
+
     except Exception as e:
         logger.error("Failed to reload configuration module: %s", str(e))
         raise HTTPException(
@@ -11,13 +11,17 @@ import base64
 from atlassian import Confluence
 
 from app.filter_all_fragments import filter_all_fragments
-from app.filter_approved_fragments import filter_approved_fragments
 from app.page_cache import get_page_data_cached
-from app.config import CONFLUENCE_BASE_URL
+from app.config import CONFLUENCE_BASE_URL, CONFLUENCE_MAX_CONCURRENCY
+from app.confluence_client import mount_pooled_adapter
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Отдельный лимитер потоков для обращений к Confluence: ограничивает параллельную
+# выборку страниц и не занимает общий пул потоков anyio, нужный остальным маршрутам
+_confluence_limiter = anyio.CapacityLimiter(CONFLUENCE_MAX_CONCURRENCY)
+
 
 # ============================================================================
 # МОДЕЛИ ДАННЫХ
@@ -44,6 +48,21 @@ class ExtractContentResponse(BaseModel):
     pages: List[PageContent]
 
 
+def _build_extract_response(total_pages: int, pages: List[PageContent]) -> ExtractContentResponse:
+    """
+    Собирает ответ за один проход по страницам.
+    Элементы PageContent уже созданы нашими обработчиками, поэтому конверт
+    строится через model_construct без повторной валидации списка.
+    """
+    processed_count = sum(1 for page in pages if page.content is not None)
+    return ExtractContentResponse.model_construct(
+        success=processed_count > 0,
+        total_pages=total_pages,
+        processed_pages=processed_count,
+        pages=pages
+    )
+
+
 # ============================================================================
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ДЛЯ РАБОТЫ С АУТЕНТИФИКАЦИЕЙ
 # ============================================================================
@@ -131,24 +150,15 @@ def _get_page_raw_html(confluence_client: Confluence, page_id: str) -> Optional[
 
 
 def _process_page_with_custom_credentials(
-        username: str,
-        password: str,
+        confluence_client: Confluence,
         page_id: str
 ) -> PageContent:
     """
     Синхронная функция для извлечения контента страницы с кастомными учетными данными.
-    Создает отдельное соединение с Confluence для каждого запроса.
+    Использует клиент Confluence, созданный для запроса и общий для всех его страниц.
     """
     try:
-        logger.debug("[_process_page_with_custom_credentials] Processing page_id=%s with user=%s",
-                     page_id, username)
-
-        # Создаем отдельное соединение с Confluence с переданными credentials
-        confluence_client = Confluence(
-            url=CONFLUENCE_BASE_URL,
-            username=username,
-            password=password
-        )
+        logger.debug("[_process_page_with_custom_credentials] Processing page_id=%s", page_id)
 
         # Получаем raw HTML напрямую из Confluence (без кеширования)
         page_data = _get_page_raw_html(confluence_client, page_id)
@@ -240,7 +250,8 @@ def _process_page_all_content(page_id: str) -> PageContent:
                 error="Page content not found or empty"
             )
 
-        extracted_content = filter_all_fragments(html_content)
+        # Фрагменты уже извлечены при загрузке страницы в кеш
+        extracted_content = page_data.get('full_content')
 
         if not extracted_content or not extracted_content.strip():
             logger.warning("[_process_page_all_content] No extractable content for page_id=%s", page_id)
@@ -301,7 +312,8 @@ def _process_page_approved_content(page_id: str) -> PageContent:
                 error="Page content not found or empty"
             )
 
-        extracted_content = filter_approved_fragments(html_content)
+        # Фрагменты уже извлечены при загрузке страницы в кеш
+        extracted_content = page_data.get('approved_content')
 
         if not extracted_content or not extracted_content.strip():
             logger.warning("[_process_page_approved_content] No approved content for page_id=%s", page_id)
@@ -355,32 +367,23 @@ async def extract_all_content(request: ExtractContentRequest):
     logger.info("[extract_all_content] <- Processing %d page(s) in parallel", len(request.page_ids))
 
     if not request.page_ids:
-        return ExtractContentResponse(
-            success=False,
-            total_pages=0,
-            processed_pages=0,
-            pages=[],
-        )
+        return _build_extract_response(0, [])
 
     async def process_page_async(page_id: str) -> PageContent:
         """Обертка для запуска синхронной функции в thread pool"""
-        return await anyio.to_thread.run_sync(_process_page_all_content, page_id)
+        return await anyio.to_thread.run_sync(_process_page_all_content, page_id,
+                                              limiter=_confluence_limiter)
 
     pages_content = await asyncio.gather(
         *[process_page_async(page_id) for page_id in request.page_ids]
     )
 
-    processed_count = sum(1 for page in pages_content if page.content is not None)
+    response = _build_extract_response(len(request.page_ids), list(pages_content))
 
     logger.info("[extract_all_content] -> Processed %d/%d pages successfully",
-                processed_count, len(request.page_ids))
+                response.processed_pages, len(request.page_ids))
 
-    return ExtractContentResponse(
-        success=processed_count > 0,
-        total_pages=len(request.page_ids),
-        processed_pages=processed_count,
-        pages=pages_content
-    )
+    return response
 
 
 @router.post("/extract_approved_content",
@@ -403,32 +406,23 @@ async def extract_approved_content(request: ExtractContentRequest):
     logger.info("[extract_approved_content] <- Processing %d page(s) in parallel", len(request.page_ids))
 
     if not request.page_ids:
-        return ExtractContentResponse(
-            success=False,
-            total_pages=0,
-            processed_pages=0,
-            pages=[],
-        )
+        return _build_extract_response(0, [])
 
     async def process_page_async(page_id: str) -> PageContent:
         """Обертка для запуска синхронной функции в thread pool"""
-        return await anyio.to_thread.run_sync(_process_page_approved_content, page_id)
+        return await anyio.to_thread.run_sync(_process_page_approved_content, page_id,
+                                              limiter=_confluence_limiter)
 
     pages_content = await asyncio.gather(
         *[process_page_async(page_id) for page_id in request.page_ids]
     )
 
-    processed_count = sum(1 for page in pages_content if page.content is not None)
+    response = _build_extract_response(len(request.page_ids), list(pages_content))
 
     logger.info("[extract_approved_content] -> Processed %d/%d pages successfully",
-                processed_count, len(request.page_ids))
+                response.processed_pages, len(request.page_ids))
 
-    return ExtractContentResponse(
-        success=processed_count > 0,
-        total_pages=len(request.page_ids),
-        processed_pages=processed_count,
-        pages=pages_content
-    )
+    return response
 
 
 @router.post("/markdown",
@@ -445,7 +439,7 @@ async def extract_markdown_with_credentials(
     В отличие от /extract_all_content:
     - Использует HTTP Basic Authentication из заголовка Authorization
     - НЕ использует кеширование (каждый запрос идет напрямую в Confluence)
-    - Создает отдельное соединение для каждого запроса
+    - Создает отдельный клиент Confluence для каждого запроса (общий для всех его страниц)
     - Работает параллельно для всех страниц
     - Валидация credentials происходит при первой попытке получить страницу
 
@@ -487,27 +481,34 @@ async def extract_markdown_with_credentials(
                 len(request.page_ids), username)
 
     if not request.page_ids:
-        return ExtractContentResponse(
-            success=False,
-            total_pages=0,
-            processed_pages=0,
-            pages=[],
-        )
+        return _build_extract_response(0, [])
+
+    # Один клиент с переданными credentials на весь запрос: страницы используют
+    # общую сессию и пул keep-alive соединений вместо нового клиента на каждую страницу
+    confluence_client = Confluence(
+        url=CONFLUENCE_BASE_URL,
+        username=username,
+        password=password
+    )
+    mount_pooled_adapter(confluence_client)
 
     # Параллельная обработка всех страниц с кастомными credentials
     async def process_page_async(page_id: str) -> PageContent:
         """Обертка для запуска синхронной функции в thread pool"""
         return await anyio.to_thread.run_sync(
             _process_page_with_custom_credentials,
-            username,
-            password,
-            page_id
+            confluence_client,
+            page_id,
+            limiter=_confluence_limiter
         )
 
-    pages_content = await asyncio.gather(
-        *[process_page_async(page_id) for page_id in request.page_ids],
-        return_exceptions=True  # Продолжаем обработку даже если одна страница упала
-    )
+    try:
+        pages_content = await asyncio.gather(
+            *[process_page_async(page_id) for page_id in request.page_ids],
+            return_exceptions=True  # Продолжаем обработку даже если одна страница упала
+        )
+    finally:
+        confluence_client.close()
 
     # Обрабатываем возможные исключения
     processed_pages = []
@@ -524,10 +525,10 @@ async def extract_markdown_with_credentials(
         else:
             processed_pages.append(result)
 
-    processed_count = sum(1 for page in processed_pages if page.content is not None)
+    response = _build_extract_response(len(request.page_ids), processed_pages)
 
     # Если ни одна страница не обработана и везде ошибки авторизации - возвращаем 401
-    if processed_count == 0 and any(
+    if response.processed_pages == 0 and any(
             page.error and ('access denied' in page.error.lower() or 'unauthorized' in page.error.lower())
             for page in processed_pages
     ):
@@ -538,14 +539,9 @@ async def extract_markdown_with_credentials(
         )
 
     logger.info("[extract_markdown_with_credentials] -> Processed %d/%d pages successfully for user=%s",
-                processed_count, len(request.page_ids), username)
+                response.processed_pages, len(request.page_ids), username)
 
-    return ExtractContentResponse(
-        success=processed_count > 0,
-        total_pages=len(request.page_ids),
-        processed_pages=processed_count,
-        pages=processed_pages
-    )
+    return response
 
 
 @router.get("/extract_health", tags=["Извлечение контента"])
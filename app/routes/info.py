@@ -3,10 +3,9 @@
 import time
 from datetime import datetime, timedelta
 from fastapi import APIRouter
-import os
 import logging
 
-from app.config import APP_VERSION
+from app.config import APP_VERSION, GIT_COMMIT_SHA
 
 logger = logging.getLogger(__name__)  # Лучше использовать __name__ для именованных логгеров
 
@@ -17,7 +16,7 @@ router = APIRouter()
 
 
 @router.get("/info")
-def get_info():
+async def get_info():
     """Возвращает информацию о приложении."""
     logger.debug("[get_info] <-.")
     # Динамическое вычисление uptime
@@ -39,7 +38,7 @@ def get_info():
     return {
         "app": "requirements-analyzer",
         "app_version": APP_VERSION,
-        "git_version": os.getenv("GIT_COMMIT_SHA", "unknown"),
+        "git_version": GIT_COMMIT_SHA,
         "uptime": uptime_str,
         "description": "RAG-based AI сервис для валидации требований аналитики."
     }
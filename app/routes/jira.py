@@ -4,30 +4,39 @@
 Маршруты для работы с Jira API.
 """
 import logging
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any
 from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, field_validator
 import anyio  # pip install anyio
 
+from app.models import DTO_CONFIG
+from app.utils.orjson_route import ORJSONRoute
 from app.jira_loader import extract_confluence_page_ids_from_jira_tasks
 from app.services.analysis_service import analyze_pages
 
 # Создаем APIRouter для FastAPI
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse, route_class=ORJSONRoute)
 
 logger = logging.getLogger(__name__)
 
 
 class PageAnalysisResult(BaseModel):
     """Модель результата анализа одной страницы."""
-    page_id: str
-    analysis: Union[Dict[str, Any], str]
-    template_analysis: Optional[Dict[str, Any]] = None
+    model_config = DTO_CONFIG
 
-    @field_validator('analysis')
+    page_id: str
+    # Итоговое значение всегда словарь: строки оборачиваются валидатором до проверки типа,
+    # поэтому перебора ветвей Union при валидации нет
+    analysis: Dict[str, Any]
+    # Непрозрачный результат проверки шаблона: набор ключей зависит от ветки анализа,
+    # а значения null значимы для клиента. Any передает его без обхода словаря
+    template_analysis: Any = None
+
+    @field_validator('analysis', mode='before')
     @classmethod
     def validate_analysis(cls, v):
-        """Валидатор для поля analysis - приводим к нужному формату"""
+        """Валидатор для поля analysis - приводим к словарю до проверки типа"""
         if isinstance(v, str):
             return {"error": v}
         elif isinstance(v, dict):
@@ -38,6 +47,8 @@ class PageAnalysisResult(BaseModel):
 
 class JiraTaskRequest(BaseModel):
     """Модель запроса для анализа задач Jira."""
+    model_config = DTO_CONFIG
+
     jira_task_ids: List[str]
     prompt_template: Optional[str] = None
     service_code: Optional[str] = None
@@ -46,6 +57,8 @@ class JiraTaskRequest(BaseModel):
 
 class JiraTaskResponse(BaseModel):
     """Модель ответа с результатом анализа."""
+    model_config = DTO_CONFIG
+
     success: bool
     jira_task_ids: List[str]
     confluence_page_ids: List[str]
@@ -55,6 +68,21 @@ class JiraTaskResponse(BaseModel):
     templates_analyzed: int = 0
 
 
+def _jira_error_response(jira_task_ids: List[str], error: str, success: bool = False) -> ORJSONResponse:
+    """
+    Ответ без найденных страниц. Возвращается напрямую, минуя валидацию response_model;
+    содержимое совпадает с JiraTaskResponse при response_model_exclude_none=True.
+    """
+    return ORJSONResponse({
+        "success": success,
+        "jira_task_ids": jira_task_ids,
+        "confluence_page_ids": [],
+        "total_pages_found": 0,
+        "error": error,
+        "templates_analyzed": 0
+    })
+
+
 @router.post("/analyze-jira-task", response_model=JiraTaskResponse, response_model_exclude_none=True)
 async def analyze_jira_task(request: JiraTaskRequest):
     """
@@ -70,13 +98,7 @@ async def analyze_jira_task(request: JiraTaskRequest):
         jira_task_ids = request.jira_task_ids
 
         if not jira_task_ids:
-            return JiraTaskResponse(
-                success=False,
-                jira_task_ids=[],
-                confluence_page_ids=[],
-                total_pages_found=0,
-                error="jira_task_ids cannot be empty"
-            )
+            return _jira_error_response([], "jira_task_ids cannot be empty")
 
         #  ШАГ 1: Извлекаем page_ids из задач Jira (блокирующая операция в thread pool)
         logger.info("[analyze_jira_task] Extracting Confluence page IDs from Jira tasks...")
@@ -88,14 +110,8 @@ async def analyze_jira_task(request: JiraTaskRequest):
         logger.info("[analyze_jira_task] Found %d Confluence page IDs", len(page_ids))
 
         if not page_ids:
-            return JiraTaskResponse(
-                success=True,
-                jira_task_ids=jira_task_ids,
-                confluence_page_ids=[],
-                total_pages_found=0,
-                analysis_results=None,
-                error="No Confluence page IDs found in the specified Jira tasks"
-            )
+            return _jira_error_response(jira_task_ids, "No Confluence page IDs found in the specified Jira tasks",
+                                        success=True)
 
         #  ШАГ 2: Проводим анализ найденных страниц (блокирующая операция в thread pool)
         logger.info("[analyze_jira_task] Starting analysis of %d pages with check_templates=%s",
@@ -123,17 +139,13 @@ async def analyze_jira_task(request: JiraTaskRequest):
                 if template_analysis and template_analysis.get("template_type"):
                     templates_analyzed += 1
 
-                # Создаем объект с условными параметрами
-                result_params = {
-                    "page_id": result["page_id"],
-                    "analysis": result["analysis"]
-                }
-
-                # Добавляем template_analysis только если он существует
-                if template_analysis:
-                    result_params["template_analysis"] = template_analysis
-
-                parsed_result = PageAnalysisResult(**result_params)
+                # Результаты сформированы нашим сервисом, поэтому повторная валидация не нужна:
+                # создаем модель без проверки, приводя analysis к словарю тем же валидатором
+                parsed_result = PageAnalysisResult.model_construct(
+                    page_id=result["page_id"],
+                    analysis=PageAnalysisResult.validate_analysis(result["analysis"]),
+                    template_analysis=template_analysis or None
+                )
                 parsed_results.append(parsed_result)
 
                 logger.debug(
@@ -152,7 +164,7 @@ async def analyze_jira_task(request: JiraTaskRequest):
         logger.info("[analyze_jira_task] Successfully parsed %d results, %d templates analyzed",
                     len(parsed_results), templates_analyzed)
 
-        return JiraTaskResponse(
+        return JiraTaskResponse.model_construct(
             success=True,
             jira_task_ids=jira_task_ids,
             confluence_page_ids=page_ids,
@@ -163,13 +175,7 @@ async def analyze_jira_task(request: JiraTaskRequest):
 
     except Exception as e:
         logger.error("[analyze_jira_task] Error: %s", str(e), exc_info=True)
-        return JiraTaskResponse(
-            success=False,
-            jira_task_ids=request.jira_task_ids if request else [],
-            confluence_page_ids=[],
-            total_pages_found=0,
-            error=str(e)
-        )
+        return _jira_error_response(request.jira_task_ids if request else [], str(e))
 
 
 @router.get("/jira/health")
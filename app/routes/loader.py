@@ -1,33 +1,42 @@
 # app/routes/loader.py - ИСПРАВЛЕННАЯ ВЕРСИЯ с параллельностью
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 import logging
 import anyio  # pip install anyio
 
-from app.services.document_service import DocumentService
+from app.models import DTO_CONFIG
+from app.utils.orjson_route import ORJSONRoute
+from app.services.document_service import get_document_service
 from app.llm_interface import get_embeddings_cache_info, clear_embeddings_cache
 from app.page_cache import clear_page_cache, get_cache_info
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse, route_class=ORJSONRoute)
 
-# Инициализируем сервис (простое создание без DI)
-document_service = DocumentService()
+# Общий экземпляр сервиса (без DI, один на процесс)
+document_service = get_document_service()
 
 
 class LoadRequest(BaseModel):
+    model_config = DTO_CONFIG
+
     page_ids: List[str]
     service_code: Optional[str] = None
     source: str = "DBOCORPESPLN"
 
 
 class TemplateLoadRequest(BaseModel):
+    model_config = DTO_CONFIG
+
     templates: Dict[str, str]
 
 
 class RemovePagesRequest(BaseModel):
+    model_config = DTO_CONFIG
+
     page_ids: List[str]
     service_code: Optional[str] = None
 
@@ -66,10 +75,10 @@ async def load_service_pages(payload: LoadRequest):
         }
     except ValueError as e:
         logger.error("[load_service_pages] Validation error: %s", str(e))
-        return {"error": str(e)}
+        return ORJSONResponse({"error": str(e)})
     except Exception as e:
         logger.exception("[load_service_pages] Unexpected error")
-        return {"error": str(e)}
+        return ORJSONResponse({"error": str(e)})
 
 
 @router.post("/load_templates", tags=["Загрузка Confluence шаблонов страниц требований"])
@@ -91,7 +100,7 @@ async def load_templates(payload: TemplateLoadRequest):
         }
     except Exception as e:
         logger.exception("[load_templates] Error")
-        return {"error": str(e)}
+        return ORJSONResponse({"error": str(e)})
 
 
 @router.get("/child_pages/{page_id}",
@@ -112,10 +121,11 @@ async def get_child_pages(page_id: str, service_code: Optional[str] = None, sour
             source
         )
         logger.info("[get_child_pages] -> Found %d child pages", len(result["page_ids"]))
-        return result
+        # Результат сервиса уже JSON-совместим: отдаем его без повторного обхода jsonable_encoder
+        return ORJSONResponse(result)
     except Exception as e:
         logger.exception("[get_child_pages] Error")
-        return {"error": str(e)}
+        return ORJSONResponse({"error": str(e)})
 
 
 @router.post("/remove_service_pages", response_description="Удаление фрагментов страниц из единого хранилища")
@@ -141,7 +151,7 @@ async def remove_service_pages(request: RemovePagesRequest):
         }
     except Exception as e:
         logger.error("[remove_service_pages] Error: %s", str(e))
-        return {"error": str(e)}
+        return ORJSONResponse({"error": str(e)})
 
 
 @router.post("/remove_platform_pages", response_description="Удаление фрагментов платформенных страниц")
@@ -170,10 +180,10 @@ async def remove_platform_pages(request: RemovePagesRequest):
         }
     except ValueError as e:
         logger.error("[remove_platform_pages] Validation error: %s", str(e))
-        return {"error": str(e)}
+        return ORJSONResponse({"error": str(e)})
     except Exception as e:
         logger.error("[remove_platform_pages] Error: %s", str(e))
-        return {"error": str(e)}
+        return ORJSONResponse({"error": str(e)})
 
 
 @router.get("/debug_collections", tags=["Отладка"])
@@ -191,13 +201,13 @@ async def debug_collections():
         )
         return result
     except Exception as e:
-        return {"error": str(e), "storage": "unified_requirements"}
+        return ORJSONResponse({"error": str(e), "storage": "unified_requirements"})
 
 
 # Сохраняем функцию remove_service_fragments для обратной совместимости с тестами
 def remove_service_fragments(page_ids: List[str]) -> int:
     """DEPRECATED: Используйте DocumentService.remove_page_fragments"""
-    logger.info("Deprecated [remove_service_fragments] <- page_ids=%s", page_ids)
+    logger.info("Deprecated [remove_service_fragments] <- %d page(s)", len(page_ids))
     return document_service.remove_page_fragments(page_ids)
 
 
@@ -1,5 +1,6 @@
 # app/routes/summary.py
 
+import anyio
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
@@ -35,6 +36,7 @@ class GenerateServiceSummaryResponse(BaseModel):
 
 @router.post("/generate_service_summary",
              response_model=GenerateServiceSummaryResponse,
+             response_model_exclude_none=True,
              tags=["Саммари сервиса"],
              summary="Генерация краткого описания назначения сервиса")
 async def generate_service_summary(request: GenerateServiceSummaryRequest):
@@ -65,11 +67,12 @@ async def generate_service_summary(request: GenerateServiceSummaryRequest):
             max_pages=request.max_pages
         )
 
-        # Генерируем саммари
-        result = summary_service.generate_service_summary(
-            parent_page_id=request.parent_page_id,
-            use_approved_only=request.use_approved_only,
-            custom_prompt=request.custom_prompt
+        # Генерируем саммари в пуле потоков: обращения к Confluence и LLM блокирующие
+        result = await anyio.to_thread.run_sync(
+            summary_service.generate_service_summary,
+            request.parent_page_id,
+            request.use_approved_only,
+            request.custom_prompt
         )
 
         logger.info("[generate_service_summary] -> success=%s", result.get("success"))
@@ -87,6 +90,7 @@ async def generate_service_summary(request: GenerateServiceSummaryRequest):
 
 @router.get("/service_summary/{parent_page_id}",
             response_model=GenerateServiceSummaryResponse,
+            response_model_exclude_none=True,
             tags=["Саммари сервиса"],
             summary="Быстрая генерация саммари сервиса (GET)")
 async def get_service_summary(
@@ -52,13 +52,12 @@ async def analyze_template_types(request: AnalyzeTypesRequest):
             request.page_ids
         )
 
-        # Формируем результат в виде пар page_id - template_name
-        results = []
-        for page_id, template_type in zip(request.page_ids, template_types):
-            results.append(PageTemplateResult(
-                page_id=page_id,
-                template_name=template_type
-            ))
+        # Формируем результат в виде пар page_id - template_name.
+        # Данные получены от нашего сервиса, поэтому модели создаются без повторной валидации
+        results = [
+            PageTemplateResult.model_construct(page_id=page_id, template_name=template_type)
+            for page_id, template_type in zip(request.page_ids, template_types)
+        ]
 
         # Подсчитываем статистику
         identified_count = sum(1 for result in results if result.template_name is not None)
@@ -66,7 +65,7 @@ async def analyze_template_types(request: AnalyzeTypesRequest):
         logger.info("[analyze_template_types] -> Identified %d/%d template types",
                     identified_count, len(request.page_ids))
 
-        return AnalyzeTypesResponse(
+        return AnalyzeTypesResponse.model_construct(
             results=results,
             total_pages=len(request.page_ids),
             identified_types=identified_count
@@ -76,14 +75,12 @@ async def analyze_template_types(request: AnalyzeTypesRequest):
         logger.error("[analyze_template_types] Error: %s", str(e))
 
         # В случае ошибки возвращаем пустые результаты
-        error_results = []
-        for page_id in request.page_ids:
-            error_results.append(PageTemplateResult(
-                page_id=page_id,
-                template_name=None
-            ))
-
-        return AnalyzeTypesResponse(
+        error_results = [
+            PageTemplateResult.model_construct(page_id=page_id, template_name=None)
+            for page_id in request.page_ids
+        ]
+
+        return AnalyzeTypesResponse.model_construct(
             results=error_results,
             total_pages=len(request.page_ids),
             identified_types=0
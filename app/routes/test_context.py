@@ -1,6 +1,7 @@
 # app/routes/test_context.py
 
 import logging
+import anyio
 from fastapi import APIRouter, HTTPException
 from langchain_core.prompts import PromptTemplate
 from langchain.chains.llm import LLMChain
@@ -46,8 +47,8 @@ async def test_context_size(context_size: int):
         # Создаем цепочку
         chain = LLMChain(llm=llm, prompt=prompt_template)
 
-        # Вызываем цепочку
-        result = chain.run({"requirement": "Тест", "context": context})
+        # Вызываем цепочку в пуле потоков, чтобы не блокировать event loop
+        result = await anyio.to_thread.run_sync(chain.run, {"requirement": "Тест", "context": context})
 
         logger.info("[test_context_size] → Success, result length: %d", len(str(result)))
         return {
@@ -3,20 +3,48 @@
 import json
 import logging
 import os
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Tuple
 from app.config import SERVICES_REGISTRY_FILE
 
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=1)
+def _load_registry() -> Tuple[List[Dict], Dict[str, Dict]]:
+    """
+    Читает services.json один раз и строит индекс сервисов по коду.
+    Ошибка чтения не кешируется: следующий вызов повторит попытку.
+    """
+    service_file_path = os.path.join(os.path.dirname(__file__), "data", SERVICES_REGISTRY_FILE)
+    logger.debug("[_load_registry] <- %s", service_file_path)
+    with open(service_file_path, encoding="utf-8") as f:
+        services = json.load(f)
+    logger.debug("[_load_registry] loaded: %s", services)
+    # При повторе кода действует первая запись, как при прежнем поиске по списку
+    index = {}
+    for service in services:
+        index.setdefault(service["code"], service)
+    return services, index
+
+
+def reload_services() -> None:
+    """Сбрасывает кеш реестра сервисов: следующее обращение перечитает services.json"""
+    _load_registry.cache_clear()
+    logger.info("[reload_services] Services registry cache cleared")
+
+
+def _get_services_index() -> Dict[str, Dict]:
+    try:
+        return _load_registry()[1]
+    except Exception as e:
+        logging.exception("Ошибка при чтении services.json: {%s}", e)
+        return {}
+
+
 def load_services() -> List[Dict]:
     try:
-        service_file_path = os.path.join(os.path.dirname(__file__), "data", SERVICES_REGISTRY_FILE)
-        logger.debug("[load_services] <- %s", service_file_path)
-        with open(service_file_path, encoding="utf-8") as f:
-            l = json.load(f)
-            logger.debug("[load_services] loaded: %s", l)
-            # return json.load(f)
-            return l
+        return _load_registry()[0]
     except Exception as e:
         logging.exception("Ошибка при чтении services.json: {%s}", e)
         return []
@@ -24,12 +52,9 @@ def load_services() -> List[Dict]:
 
 def get_service_by_code(code: str) -> Dict:
     logger.debug("[get_service_by_code] <- code='%s'", code)
-    services = load_services()
-
-    for service in services:
-        logger.debug("[get_service_by_code] test '%s'", service["code"])
-        if service["code"] == code:
-            return service
+    service = _get_services_index().get(code)
+    if service is not None:
+        return service
     logger.warning("[get_service_by_code] -> None")
     return {}
 
@@ -39,7 +64,7 @@ def get_platform_services() -> List[dict]:
 
 
 def is_valid_service(code: str) -> bool:
-    return get_service_by_code(code) != {}
+    return code in _get_services_index()
 
 
 def is_platform_service(service_code: str) -> bool:
@@ -47,11 +72,8 @@ def is_platform_service(service_code: str) -> bool:
     Проверяет, является ли сервис платформенным по коду.
     Возвращает True, если найден и platform=true, иначе False.
     """
-    services = load_services()
-    for svc in services:
-        if svc.get("code") == service_code:
-            return svc.get("platform", False)
-    return False
+    service = _get_services_index().get(service_code)
+    return service.get("platform", False) if service else False
 
 
 def get_platform_status(service_code: str) -> bool:
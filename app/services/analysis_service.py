@@ -3,7 +3,7 @@
 import json
 import re
 import time
-from typing import Optional, List
+from typing import Optional, List, Iterator
 from app.config import (
     PAGE_ANALYSIS_PROMPT_FILE,
     UNIFIED_STORAGE_NAME,
@@ -51,8 +51,9 @@ def analyze_pages(page_ids: List[str], prompt_template: Optional[str] = None,
     Returns:
         Список результатов анализа
     """
-    logger.info("[analyze_pages] <- page_ids=%s, service_code=%s, check_templates=%s",
-                page_ids, service_code, check_templates)
+    logger.info("[analyze_pages] <- %d page(s), service_code=%s, check_templates=%s",
+                len(page_ids), service_code, check_templates)
+    logger.debug("[analyze_pages] page_ids=%s", page_ids)
 
     try:
         if not service_code:
@@ -65,12 +66,12 @@ def analyze_pages(page_ids: List[str], prompt_template: Optional[str] = None,
 
         # Определяем размер контекста LLM
         llm_context_size = get_llm_context_size()
-        logger.info(f"[analyze_pages] LLM model: {LLM_MODEL}, context size: {llm_context_size}")
+        logger.info("[analyze_pages] LLM model: %s, context size: %s", LLM_MODEL, llm_context_size)
 
         # Загружаем и измеряем системный промпт
         template = prompt_template or open(PAGE_ANALYSIS_PROMPT_FILE, "r", encoding="utf-8").read().strip()
         template_tokens = count_tokens(template)
-        logger.info(f"[analyze_pages] System prompt size: {template_tokens} tokens")
+        logger.info("[analyze_pages] System prompt size: %d tokens", template_tokens)
 
         # Инициализация для цикла
         requirements = []
@@ -88,8 +89,8 @@ def analyze_pages(page_ids: List[str], prompt_template: Optional[str] = None,
 
         for page_id in page_ids:
             logger.debug(
-                f"[analyze_pages] Page {page_id}: current_req_tokens={current_req_tokens}, "
-                f"budget={token_budget['requirements']}"
+                "[analyze_pages] Page %s: current_req_tokens=%d, budget=%d",
+                page_id, current_req_tokens, token_budget['requirements']
             )
 
             # Получаем данные страницы через кеш
@@ -117,7 +118,7 @@ def analyze_pages(page_ids: List[str], prompt_template: Optional[str] = None,
 
             # Подсчитываем токены для этой страницы
             req_tokens = count_tokens(page_text_with_header)
-            logger.debug(f"[analyze_pages] Page {page_id}: {req_tokens} tokens")
+            logger.debug("[analyze_pages] Page %s: %d tokens", page_id, req_tokens)
 
             # ПРОВЕРКА: влезет ли страница в бюджет требований?
             if current_req_tokens + req_tokens <= token_budget['requirements']:
@@ -131,13 +132,13 @@ def analyze_pages(page_ids: List[str], prompt_template: Optional[str] = None,
                 current_req_tokens += req_tokens
 
                 logger.debug(
-                    f"[analyze_pages] Added page {page_id}: "
-                    f"{req_tokens} tokens (total: {current_req_tokens}/{token_budget['requirements']})"
+                    "[analyze_pages] Added page %s: %d tokens (total: %d/%d)",
+                    page_id, req_tokens, current_req_tokens, token_budget['requirements']
                 )
             else:
                 logger.warning(
-                    f"[analyze_pages] Excluded page {page_id}: would exceed budget "
-                    f"({current_req_tokens + req_tokens} > {token_budget['requirements']})"
+                    "[analyze_pages] Excluded page %s: would exceed budget (%d > %d)",
+                    page_id, current_req_tokens + req_tokens, token_budget['requirements']
                 )
                 # Не добавляем страницу и прерываем цикл
                 break
@@ -154,11 +155,11 @@ def analyze_pages(page_ids: List[str], prompt_template: Optional[str] = None,
         )
 
         logger.info(
-            f"[analyze_pages] Final token budget after adding {len(requirements)} pages: "
-            f"prompt={token_budget['system_prompt']}, "
-            f"requirements={current_req_tokens}/{token_budget['requirements']}, "
-            f"context_budget={token_budget['rag_context']}, "
-            f"response={token_budget['response_reserve']}"
+            "[analyze_pages] Final token budget after adding %d pages: "
+            "prompt=%d, requirements=%d/%d, context_budget=%d, response=%d",
+            len(requirements), token_budget['system_prompt'],
+            current_req_tokens, token_budget['requirements'],
+            token_budget['rag_context'], token_budget['response_reserve']
         )
 
         # ПЕРЕРАСПРЕДЕЛЕНИЕ: если требования меньше бюджета - отдаем токены контексту
@@ -166,8 +167,9 @@ def analyze_pages(page_ids: List[str], prompt_template: Optional[str] = None,
             tokens_saved = token_budget['requirements'] - current_req_tokens
             token_budget['rag_context'] += tokens_saved
             logger.info(
-                f"[analyze_pages] Redistributed {tokens_saved} unused requirement tokens to context. "
-                f"New context budget: {token_budget['rag_context']} tokens"
+                "[analyze_pages] Redistributed %d unused requirement tokens to context. "
+                "New context budget: %d tokens",
+                tokens_saved, token_budget['rag_context']
             )
 
         # Формируем requirements_text с заголовками
@@ -186,16 +188,17 @@ def analyze_pages(page_ids: List[str], prompt_template: Optional[str] = None,
         )
 
         context_tokens = count_tokens(context)
-        logger.info(f"[analyze_pages] Context built: {context_tokens} tokens")
+        logger.info("[analyze_pages] Context built: %d tokens", context_tokens)
 
         # ФИНАЛЬНАЯ ПРОВЕРКА общего размера
         total_tokens = template_tokens + current_req_tokens + context_tokens
         max_safe_tokens = llm_context_size - token_budget['response_reserve']
 
         logger.info(
-            f"[analyze_pages] Final token usage: "
-            f"prompt={template_tokens}, req={current_req_tokens}, ctx={context_tokens}, "
-            f"total={total_tokens}/{max_safe_tokens} ({total_tokens / llm_context_size * 100:.1f}% of LLM context)"
+            "[analyze_pages] Final token usage: "
+            "prompt=%d, req=%d, ctx=%d, total=%d/%d (%.1f%% of LLM context)",
+            template_tokens, current_req_tokens, context_tokens,
+            total_tokens, max_safe_tokens, total_tokens / llm_context_size * 100
         )
 
         # Если все равно превышен лимит - обрезаем контекст (safety net)
@@ -204,20 +207,21 @@ def analyze_pages(page_ids: List[str], prompt_template: Optional[str] = None,
             new_context_budget = context_tokens - overflow - 200  # -200 для запаса
 
             logger.warning(
-                f"[analyze_pages] Token overflow detected: {overflow} tokens. "
-                f"Reducing context from {context_tokens} to {new_context_budget}"
+                "[analyze_pages] Token overflow detected: %d tokens. Reducing context from %d to %d",
+                overflow, context_tokens, new_context_budget
             )
 
             context = truncate_smart(context, new_context_budget, preserve_start=True)
             context_tokens = count_tokens(context)
             total_tokens = template_tokens + current_req_tokens + context_tokens
 
-            logger.info(f"[analyze_pages] After emergency reduction: total={total_tokens} tokens")
+            logger.info("[analyze_pages] After emergency reduction: total=%d tokens", total_tokens)
 
         # Проверка на критическое превышение
         if total_tokens > llm_context_size:
             logger.error(
-                f"[analyze_pages] CRITICAL: Total tokens ({total_tokens}) exceed LLM limit ({llm_context_size})"
+                "[analyze_pages] CRITICAL: Total tokens (%d) exceed LLM limit (%d)",
+                total_tokens, llm_context_size
             )
             return [{
                 "page_id": pid,
@@ -311,12 +315,11 @@ def _analyze_page_template_if_needed(page_id: str, service_code: str) -> Optiona
     logger.info("[_analyze_page_template_if_needed] <- Checking page_id: %s", page_id)
 
     try:
-        from app.services.document_service import DocumentService
+        from app.services.document_service import get_document_service
         from app.services.template_type_analysis import analyze_page_template_type
 
-        # Проверяем наличие одобренных фрагментов
-        document_service = DocumentService()
-        has_fragments = document_service.has_approved_fragments([page_id])
+        # Проверяем наличие одобренных фрагментов (общий экземпляр сервиса, без создания на каждую страницу)
+        has_fragments = get_document_service().has_approved_fragments([page_id])
 
         if has_fragments:
             logger.info(
@@ -386,6 +389,17 @@ def analyze_with_templates(items: List[dict], prompt_template: Optional[str] = N
     """
     Анализирует новые требования и их соответствие шаблонам с передачей шаблона в LLM.
     """
+    results = list(iter_analyze_with_templates(items, prompt_template, service_code))
+    logger.info("[analyze_with_templates] -> Completed analysis for %d items", len(results))
+    return results
+
+
+def iter_analyze_with_templates(items: List[dict], prompt_template: Optional[str] = None,
+                                service_code: Optional[str] = None) -> Iterator[dict]:
+    """
+    Потоковый вариант analyze_with_templates: отдает результат каждого требования
+    сразу после его анализа, не накапливая весь список в памяти.
+    """
     logger.info("[analyze_with_templates] <- items count: %d, service_code: %s", len(items), service_code)
 
     if not service_code:
@@ -396,7 +410,6 @@ def analyze_with_templates(items: List[dict], prompt_template: Optional[str] = N
     from app.page_cache import get_page_data_cached
     from app.services.template_type_analysis import get_template_name_by_type
 
-    results = []
     template_chain = build_template_analysis_chain(prompt_template)
 
     for item in items:
@@ -409,7 +422,7 @@ def analyze_with_templates(items: List[dict], prompt_template: Optional[str] = N
 
         if not page_data:
             logger.warning("[analyze_with_templates] Could not load page data for %s", page_id)
-            results.append({
+            yield {
                 "page_id": page_id,
                 "requirement_type": requirement_type,
                 "template_analysis": {
@@ -417,7 +430,7 @@ def analyze_with_templates(items: List[dict], prompt_template: Optional[str] = N
                     "page_data_available": False
                 },
                 "legacy_formatting_issues": []
-            })
+            }
             continue
 
         raw_content = page_data['full_content']
@@ -432,7 +445,7 @@ def analyze_with_templates(items: List[dict], prompt_template: Optional[str] = N
 
         if not raw_content or not template_txt:
             logger.warning("[analyze_with_templates] Missing content or template for page %s", page_id)
-            results.append({
+            yield {
                 "page_id": page_id,
                 "requirement_type": requirement_type,
                 "template_analysis": {
@@ -441,7 +454,7 @@ def analyze_with_templates(items: List[dict], prompt_template: Optional[str] = N
                     "content_available": bool(raw_content)
                 },
                 "legacy_formatting_issues": []
-            })
+            }
             continue
 
         template_content = template_txt
@@ -473,7 +486,7 @@ def analyze_with_templates(items: List[dict], prompt_template: Optional[str] = N
                     "parse_error": str(json_error)
                 }
 
-            results.append({
+            yield {
                 "page_id": page_id,
                 "requirement_type": requirement_type,
                 "template_analysis": template_analysis,
@@ -481,7 +494,7 @@ def analyze_with_templates(items: List[dict], prompt_template: Optional[str] = N
                 "template_used": requirement_type,
                 "analysis_timestamp": time.time(),
                 "storage_used": UNIFIED_STORAGE_NAME
-            })
+            }
 
         except Exception as e:
             logger.error("[analyze_with_templates] Error analyzing page %s: %s", page_id, str(e))
@@ -491,7 +504,7 @@ def analyze_with_templates(items: List[dict], prompt_template: Optional[str] = N
             else:
                 error_msg = f"Ошибка анализа: {str(e)}"
 
-            results.append({
+            yield {
                 "page_id": page_id,
                 "requirement_type": requirement_type,
                 "template_analysis": {
@@ -499,10 +512,7 @@ def analyze_with_templates(items: List[dict], prompt_template: Optional[str] = N
                     "error_type": "llm_error"
                 },
                 "legacy_formatting_issues": legacy_formatting_issues
-            })
-
-    logger.info("[analyze_with_templates] -> Completed analysis for %d items", len(results))
-    return results
+            }
 
 
 def _extract_json_from_llm_response(response: str) -> Optional[str]:
@@ -4,7 +4,7 @@ from typing import Optional, List
 from langchain_core.documents import Document
 from app.config import UNIFIED_STORAGE_NAME, CHUNK_SIZE, IS_SERVICE_DOCS_CONTEXT, IS_PLATFORM_DOCS_CONTEXT, \
     IS_ENTITY_NAMES_CONTEXT, IS_SERVICE_LINKS_CONTEXT
-from app.confluence_loader import get_page_content_by_id
+from app.confluence_loader import get_page_content_by_id, get_page_title_by_id
 from app.embedding_store import get_vectorstore
 from app.llm_interface import get_embeddings_model
 from app.rag_pipeline import logger, _extract_links_from_unconfirmed_fragments, \
@@ -145,8 +145,8 @@ def build_context_optimized(
         MAX_DOCS_TOTAL = min(max(5, estimated_docs), 20)
 
         logger.info(
-            f"[build_context_optimized] Adaptive limits: max_tokens={MAX_TOKENS_TOTAL}, "
-            f"max_docs={MAX_DOCS_TOTAL} (based on CHUNK_SIZE={CHUNK_SIZE})"
+            "[build_context_optimized] Adaptive limits: max_tokens=%d, max_docs=%d (based on CHUNK_SIZE=%d)",
+            MAX_TOKENS_TOTAL, MAX_DOCS_TOTAL, CHUNK_SIZE
         )
 
     context_docs = []
@@ -483,7 +483,6 @@ def _extract_linked_context_optimized(exclude_page_ids: List[str]) -> List[Docum
 
                 linked_content = _get_approved_content_cached(linked_page_id)
                 if linked_content and linked_content.strip():
-                    from app.confluence_loader import get_page_title_by_id
                     linked_title = get_page_title_by_id(linked_page_id) or f"Страница {linked_page_id}"
 
                     doc = Document(
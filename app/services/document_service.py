@@ -18,8 +18,9 @@ class DocumentService:
     def load_approved_pages(self, page_ids: List[str], service_code: Optional[str] = None,
                             source: str = "DBOCORPESPLN") -> Dict:
         """Загружает только подтвержденные требования в единое хранилище"""
-        logger.info("[DocumentService.load_approved_pages] <- page_ids=%s, service_code=%s",
-                    page_ids, service_code)
+        logger.info("[DocumentService.load_approved_pages] <- %d page(s), service_code=%s",
+                    len(page_ids), service_code)
+        logger.debug("[DocumentService.load_approved_pages] page_ids=%s", page_ids)
 
         # Определяем код сервиса
         if not service_code:
@@ -73,13 +74,11 @@ class DocumentService:
                                            source: str = "DBOCORPESPLN") -> Dict:
         """Получает дочерние страницы с опциональной загрузкой"""
         child_page_ids = get_child_page_ids(page_id)
-        result = {"page_ids": child_page_ids, "load_result": None}
-
-        if service_code and child_page_ids:
-            load_result = self.load_approved_pages(child_page_ids, service_code, source)
-            result["load_result"] = load_result
-
-        return result
+        return {
+            "page_ids": child_page_ids,
+            "load_result": (self.load_approved_pages(child_page_ids, service_code, source)
+                            if service_code and child_page_ids else None)
+        }
 
     def remove_page_fragments(self, page_ids: List[str]) -> int:
         """Удаляет фрагменты требований для указанных страниц"""
@@ -276,4 +275,17 @@ class DocumentService:
             'large_documents': large_docs[:20],  # Топ-20
             'largest_size_chars': large_docs[0]['size_chars'] if large_docs else 0,
             'largest_size_tokens_estimate': large_docs[0]['size_tokens_estimate'] if large_docs else 0
-        }
\ No newline at end of file
+        }
+
+
+# Общий экземпляр сервиса: DocumentService не хранит состояния запроса,
+# поэтому создавать его на каждый вызов не нужно
+_document_service: Optional[DocumentService] = None
+
+
+def get_document_service() -> DocumentService:
+    """Возвращает общий экземпляр DocumentService, создавая его при первом обращении"""
+    global _document_service
+    if _document_service is None:
+        _document_service = DocumentService()
+    return _document_service
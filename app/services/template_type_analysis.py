@@ -5,7 +5,6 @@ import logging
 import os
 import re
 from typing import List, Optional, Dict, Any
-from app.confluence_loader import get_page_content_by_id, get_page_title_by_id
 from app.filter_all_fragments import filter_all_fragments
 
 logger = logging.getLogger(__name__)
@@ -34,7 +33,6 @@ class TemplateTypeAnalyzer:
     def analyze_content_type(self, page_title: str, page_html: str) -> Optional[str]:
         """
         Определяет тип шаблона для одной страницы Confluence.
-        TODO: нужно добавить метод передачи сразу текстового содержимого, чтобы избежать лишнего преобразования.
         Args:
             page_html: HTML содержимое страницы
             page_title: Наименование страницы
@@ -48,20 +46,34 @@ class TemplateTypeAnalyzer:
             return None
 
         # Получаем текстовое содержимое страницы
-        page_content = filter_all_fragments(page_html)
+        return self.analyze_text_type(page_title, filter_all_fragments(page_html))
 
-        logger.debug("[analyze_content_type] Page title: '%s'", page_title)
-        logger.debug("[analyze_content_type] Page content length: %d chars", len(page_content))
+    def analyze_text_type(self, page_title: str, page_content: str) -> Optional[str]:
+        """
+        Определяет тип шаблона по уже извлеченному текстовому содержимому страницы
+        (результат filter_all_fragments), без повторного разбора HTML.
+        Args:
+            page_title: Наименование страницы
+            page_content: Текстовое содержимое страницы
+        Returns:
+            Название типа шаблона или None если не определен
+        """
+        if not page_title or page_content is None:
+            logger.warning("[analyze_text_type] -> Page title or content is None")
+            return None
+
+        logger.debug("[analyze_text_type] Page title: '%s'", page_title)
+        logger.debug("[analyze_text_type] Page content length: %d chars", len(page_content))
 
         # Проверяем каждый тип шаблона
         for template_type, template_config in self.features.items():
-            logger.debug("[analyze_content_type] Checking template type: '%s'", template_type)
+            logger.debug("[analyze_text_type] Checking template type: '%s'", template_type)
 
             if self._check_template_match(page_title, page_content, template_config):
-                logger.info("[analyze_content_type] -> Found match: '%s'", template_type)
+                logger.info("[analyze_text_type] -> Found match: '%s'", template_type)
                 return template_type
 
-        logger.info("[analyze_content_type] -> No template match found")
+        logger.info("[analyze_text_type] -> No template match found")
         return None
 
     def analyze_page_type(self, page_id: str) -> Optional[str]:
@@ -78,11 +90,15 @@ class TemplateTypeAnalyzer:
             logger.warning("[analyze_page_type] No features loaded, returning None")
             return None
 
-        # Получаем данные страницы (заголовок и содержимое)
-        page_title = get_page_title_by_id(page_id)
-        page_html = get_page_content_by_id(page_id, clean_html=False)
+        # Заголовок и содержимое берем из одной записи кеша страниц
+        from app.page_cache import get_page_data_cached
+
+        page_data = get_page_data_cached(page_id)
+        page_title = page_data['title'] if page_data else None
+        page_content = page_data['full_content'] if page_data else None
 
-        template_type = self.analyze_content_type(page_title, page_html)
+        # Полный контент уже извлечен при загрузке страницы в кеш
+        template_type = self.analyze_text_type(page_title, page_content)
         if template_type:
             logger.info("[analyze_page_type] -> Found match: '%s'", template_type)
         else:
@@ -99,7 +115,8 @@ class TemplateTypeAnalyzer:
         Returns:
             Список типов шаблонов (или None для каждой страницы)
         """
-        logger.info("[analyze_pages_types] <- pages = '%s'", page_ids)
+        logger.info("[analyze_pages_types] <- %d page(s)", len(page_ids))
+        logger.debug("[analyze_pages_types] pages = '%s'", page_ids)
 
         results = []
         for page_id in page_ids:
@@ -245,6 +262,11 @@ def analyze_content_template_type(page_title: str, page_html) -> Optional[str]:
     return _analyzer.analyze_content_type(page_title, page_html)
 
 
+def analyze_text_template_type(page_title: str, page_content: str) -> Optional[str]:
+    """Функция-обертка для анализа уже извлеченного текста страницы"""
+    return _analyzer.analyze_text_type(page_title, page_content)
+
+
 def analyze_page_template_type(page_id: str) -> Optional[str]:
     """Функция-обертка для анализа одной страницы"""
     return _analyzer.analyze_page_type(page_id)
@@ -292,11 +314,11 @@ def perform_legacy_structure_check(template_html: str, content: str) -> List[str
     """
     try:
         logger.debug("[_perform_legacy_structure_check] <- Legacy structure check")
-        from markdownify import markdownify
+        from app.utils.markdown_utils import html_to_markdown, template_to_markdown
         from bs4 import BeautifulSoup
 
-        template_md = markdownify(template_html, heading_style="ATX")
-        content_md = markdownify(content, heading_style="ATX")
+        template_md = template_to_markdown(template_html)
+        content_md = html_to_markdown(content)
         template_soup = BeautifulSoup(template_md, 'html.parser')
         content_soup = BeautifulSoup(content_md, 'html.parser')
 
@@ -50,7 +50,7 @@ def find_huge_documents(
             except Exception as e:
                 # Fallback: грубая оценка
                 tokens = size_chars // 3  # для русского текста
-                logger.debug(f"Token count fallback: {e}")
+                logger.debug("Token count fallback: %s", e)
         else:
             tokens = size_chars // 3
 
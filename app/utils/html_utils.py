@@ -0,0 +1,45 @@
+# app/utils/html_utils.py
+
+import re
+import threading
+from html import escape
+from typing import Dict, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer, builder_registry
+
+# lxml разбирает HTML на C в несколько раз быстрее встроенного html.parser.
+# Если lxml не установлен, используется стандартный парсер
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# HTML-парсер lxml превращает CDATA (тело макросов кода) в комментарий,
+# поэтому CDATA заранее заменяется экранированным текстом
+_CDATA_RE = re.compile(r'<!\[CDATA\[(.*?)\]\]>', re.DOTALL)
+
+# BeautifulSoup(html, "lxml") на каждый вызов ищет класс парсера в реестре и создает
+# новый builder. Builder переиспользуется между разборами, но хранит состояние текущего
+# разбора, а страницы разбираются в потоках пула, поэтому экземпляр свой у каждого потока
+_BUILDER_CLASS = builder_registry.lookup(HTML_PARSER)
+_builders = threading.local()
+
+
+def _get_builder():
+    """Возвращает builder текущего потока, создавая его при первом вызове"""
+    builder = getattr(_builders, "builder", None)
+    if builder is None:
+        builder = _builders.builder = _BUILDER_CLASS()
+    return builder
+
+
+def parse_html(html: str, element_classes: Optional[Dict] = None,
+               parse_only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """
+    Разбирает HTML выбранным парсером.
+    parse_only - SoupStrainer: в дерево попадают только подходящие теги с их содержимым.
+    """
+    if HTML_PARSER == "lxml" and "<![CDATA[" in html:
+        html = _CDATA_RE.sub(lambda m: escape(m.group(1), quote=False), html)
+    return BeautifulSoup(html, builder=_get_builder(), element_classes=element_classes, parse_only=parse_only)
@@ -31,7 +31,7 @@ def set_log_level(level_name: str):
 
     # Используем print для гарантии, что сообщение будет видно
     print(f"[DEBUG] Log level successfully changed to: {level_name.upper()}")
-    logging.info(f"Log level successfully changed to: {level_name.upper()}")
+    logging.info("Log level successfully changed to: %s", level_name.upper())
 
 
 def get_current_log_level() -> str:
@@ -48,7 +48,7 @@ def log_sample_messages():
     long_message = "Отладочное сообщение для тестирования обрезки 123 " * 24  #  1200 символов
 
     logger.debug("DEBUG: Это отладочное сообщение (должно быть скрыто)")
-    logger.info(f"INFO: Короткое информационное сообщение")
-    logger.info(f"INFO: Длинное информационное сообщение: {long_message}")
+    logger.info("INFO: Короткое информационное сообщение")
+    logger.info("INFO: Длинное информационное сообщение: %s", long_message)
     logger.warning("WARNING: Предупреждение")
     logger.error("ERROR: Ошибка")
\ No newline at end of file
@@ -0,0 +1,56 @@
+# app/utils/markdown_utils.py
+
+from functools import lru_cache
+
+from bs4 import Tag
+from markdownify import MarkdownConverter
+
+from app.utils.html_utils import parse_html
+
+
+class _MarkdownTag(Tag):
+    """
+    Tag с быстрым find_parent по имени тега.
+    markdownify вызывает node.find_parent('pre') для каждого тега документа, а общий
+    механизм фильтров bs4 на каждом предке стоит дорого: на больших страницах это
+    основная часть времени конвертации. Простой подъем по parent дает тот же результат.
+    """
+
+    def find_parent(self, name=None, attrs={}, **kwargs):
+        if isinstance(name, str) and not attrs and not kwargs:
+            parent = self.parent
+            while parent is not None:
+                if parent.name == name:
+                    return parent
+                parent = parent.parent
+            return None
+        return super().find_parent(name, attrs, **kwargs)
+
+
+# Один конвертер на процесс: он кеширует найденные convert_* методы между вызовами
+_converter = MarkdownConverter(heading_style="ATX")
+
+
+def html_to_markdown(html: str) -> str:
+    """
+    Конвертирует HTML в Markdown. HTML разбирается тем же парсером (lxml), что и в
+    ContentExtractor; для фрагментов storage-формата Confluence результат совпадает с
+    markdownify.markdownify(html, heading_style="ATX").
+    Результат не кешируется: Markdown страниц хранится в кеше страниц вместе с
+    остальными обработанными данными.
+    """
+    soup = parse_html(html, element_classes={Tag: _MarkdownTag})
+    return _converter.convert_soup(soup)
+
+
+# Число шаблонов, Markdown которых хранится в памяти
+TEMPLATE_MARKDOWN_CACHE_SIZE = 32
+
+
+@lru_cache(maxsize=TEMPLATE_MARKDOWN_CACHE_SIZE)
+def template_to_markdown(template_html: str) -> str:
+    """
+    html_to_markdown для HTML шаблона. Один и тот же шаблон сравнивается со многими
+    страницами, поэтому его конвертация кешируется по HTML.
+    """
+    return html_to_markdown(template_html)
@@ -0,0 +1,32 @@
+# app/utils/orjson_route.py
+
+from typing import Any, Callable, Coroutine
+
+import orjson
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+
+class ORJSONRequest(Request):
+    """
+    Запрос, тело которого разбирается через orjson вместо стандартного json.
+    orjson.JSONDecodeError наследуется от json.JSONDecodeError, поэтому
+    FastAPI по-прежнему возвращает 422 на некорректный JSON.
+    """
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    """Маршрут, передающий обработчику ORJSONRequest. Подключается через APIRouter(route_class=...)"""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original_route_handler = super().get_route_handler()
+
+        async def orjson_route_handler(request: Request) -> Response:
+            return await original_route_handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_route_handler
@@ -1,8 +1,43 @@
 # app/style_utils.py
 
 import re
+from typing import Optional
 from bs4 import Tag
 
+# Значение CSS-свойства color в атрибуте style. Компилируется один раз при импорте;
+# регистр игнорируется, поэтому lower() для всего style не нужен
+COLOR_VALUE_RE = re.compile(r'color\s*:\s*([^;]+)', re.IGNORECASE)
+
+# Предфильтр атрибута style для поиска find_all(style=...): цвет может задавать
+# только стиль, в котором есть "color", - у большинства элементов style нет вовсе
+STYLE_WITH_COLOR_RE = re.compile(r'color', re.IGNORECASE)
+
+# Стандартные цвета редактора Confluence, которые воспринимаются глазом как черный,
+# в записи без пробелов и в нижнем регистре
+BLACK_COLORS = frozenset({
+    'black', '#000', '#000000',
+    'rgb(0,0,0)', 'rgba(0,0,0,1)',
+    'rgb(51,51,0)', 'rgb(0,51,0)', 'rgb(0,51,102)',
+    'rgb(51,51,51)', 'rgb(23,43,77)'
+})
+
+
+def get_style_color(element: Tag) -> Optional[str]:
+    """
+    Возвращает значение CSS-свойства color из атрибута style элемента
+    или None, если цвет не задан. Стиль просматривается одним поиском COLOR_VALUE_RE.
+    """
+    # У большинства элементов нет атрибута style: выходим до поиска
+    style = element.get("style")
+    if not style:
+        return None
+
+    color_match = COLOR_VALUE_RE.search(style)
+    if not color_match:
+        return None
+    return color_match.group(1)
+
+
 def has_colored_style(element: Tag) -> bool:
     """
     Проверяет, имеет ли элемент цветной стиль.
@@ -11,19 +46,11 @@ def has_colored_style(element: Tag) -> bool:
     if not isinstance(element, Tag):
         return False
 
-    style = element.get("style", "").lower()
-    if not style or "color" not in style:
+    color_value = get_style_color(element)
+    if color_value is None:
         return False
 
-    color_match = re.search(r'color\s*:\s*([^;]+)', style)
-    if not color_match:
-        return False
-
-    color_value = color_match.group(1).strip()
-
-    is_black = is_black_color(color_value)
-
-    return not is_black  # True если НЕ черный (т.е. цветной)
+    return not is_black_color(color_value)  # True если НЕ черный (т.е. цветной)
 
 def is_black_color(color_value: str) -> bool:
     """
@@ -31,18 +58,6 @@ def is_black_color(color_value: str) -> bool:
     Список стандартных комбинаций цветов в редакторе Confluence,
     которые воспринимаются глазом как черный цвет.
     """
-    color_value = color_value.strip().lower()
-    black_colors = {
-        'black', '#000', '#000000',
-        'rgb(0,0,0)', 'rgb(0, 0, 0)',
-        'rgba(0,0,0,1)', 'rgba(0, 0, 0, 1)',
-        'rgb(51,51,0)', 'rgb(51, 51, 0)',
-        'rgb(0,51,0)', 'rgb(0, 51, 0)',
-        'rgb(0,51,102)', 'rgb(0, 51, 102)',
-        'rgb(51,51,51)', 'rgb(51, 51, 51)',
-        'rgb(23,43,77)', 'rgb(23, 43, 77)'
-    }
-    # ОТЛАДКА
-    result = color_value in black_colors
-
-    return result
\ No newline at end of file
+    # Пробелы внутри значения удаляются, поэтому "rgb(0, 0, 0)" и "rgb(0,0,0)"
+    # сравниваются по одной записи в BLACK_COLORS
+    return "".join(color_value.split()).lower() in BLACK_COLORS
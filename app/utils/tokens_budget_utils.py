@@ -54,9 +54,8 @@ def calculate_token_budget(
     # Доступно для требований и контекста
     usable_tokens = available_tokens - template_tokens - response_reserve
 
-    logger.debug(f"[calculate_token_budget] Total: {available_tokens}, "
-                 f"Prompt: {template_tokens}, Response: {response_reserve}, "
-                 f"Usable: {usable_tokens}")
+    logger.debug("[calculate_token_budget] Total: %d, Prompt: %d, Response: %d, Usable: %d",
+                 available_tokens, template_tokens, response_reserve, usable_tokens)
 
     # Адаптивное распределение в зависимости от размера требований
     if requirements_length > 0:
@@ -95,11 +94,13 @@ def calculate_token_budget(
         'usable': usable_tokens
     }
 
-    logger.debug(f"[calculate_token_budget] -> Final budget: "
-                 f"system_prompt={template_tokens} ({template_tokens / available_tokens * 100:.1f}%), "
-                 f"requirements={requirements_budget} ({requirements_budget / available_tokens * 100:.1f}%), "
-                 f"rag_context={context_budget} ({context_budget / available_tokens * 100:.1f}%), "
-                 f"response_reserve={response_reserve} ({response_reserve / available_tokens * 100:.1f}%)")
+    logger.debug("[calculate_token_budget] -> Final budget: "
+                 "system_prompt=%d (%.1f%%), requirements=%d (%.1f%%), "
+                 "rag_context=%d (%.1f%%), response_reserve=%d (%.1f%%)",
+                 template_tokens, template_tokens / available_tokens * 100,
+                 requirements_budget, requirements_budget / available_tokens * 100,
+                 context_budget, context_budget / available_tokens * 100,
+                 response_reserve, response_reserve / available_tokens * 100)
 
     return budget
 
@@ -123,7 +124,7 @@ def truncate_smart(text: str, max_tokens: int, preserve_start: bool = True) -> s
     if current_tokens <= max_tokens:
         return text
 
-    logger.warning(f"[truncate_smart] Truncating from {current_tokens} to {max_tokens} tokens")
+    logger.warning("[truncate_smart] Truncating from %d to %d tokens", current_tokens, max_tokens)
 
     # Грубая оценка: 1 токен ≈ 3 символа для русского текста
     estimated_chars = max_tokens * 3
@@ -153,7 +154,7 @@ def truncate_smart(text: str, max_tokens: int, preserve_start: bool = True) -> s
 
     # Проверяем фактический размер
     actual_tokens = count_tokens(result)
-    logger.info(f"[truncate_smart] -> Result: {actual_tokens} tokens")
+    logger.info("[truncate_smart] -> Result: %d tokens", actual_tokens)
 
     return result
 
@@ -8,14 +8,21 @@ from app.confluence_loader import (
     get_child_page_ids,
     extract_approved_fragments
 )
+from app.page_cache import clear_page_cache
 
 
 class TestConfluenceLoader:
 
-    @patch('app.confluence_loader.confluence')
-    def test_get_page_content_by_id_success(self, mock_confluence):
+    def setup_method(self):
+        clear_page_cache()
+
+    @patch('app.page_cache.get_confluence')
+    def test_get_page_content_by_id_success(self, mock_get_confluence):
         """Тест успешной загрузки страницы"""
+        mock_confluence = mock_get_confluence.return_value
         mock_confluence.get_page_by_id.return_value = {
+            'title': 'Test page',
+            'version': {'number': 1},
             'body': {
                 'storage': {
                     'value': '<p>Test content</p>'
@@ -25,12 +32,14 @@ class TestConfluenceLoader:
 
         result = get_page_content_by_id('123', clean_html=False)
         assert result == '<p>Test content</p>'
-        mock_confluence.get_page_by_id.assert_called_once_with('123', expand='body.storage')
+        mock_confluence.get_page_by_id.assert_called_once_with('123', expand='body.storage,version')
 
-    @patch('app.confluence_loader.confluence')
-    def test_get_page_content_by_id_not_found(self, mock_confluence):
+    @patch('app.page_cache.get_confluence')
+    def test_get_page_content_by_id_not_found(self, mock_get_confluence):
         """Тест обработки отсутствующей страницы"""
-        mock_confluence.get_page_by_id.return_value = {
+        mock_get_confluence.return_value.get_page_by_id.return_value = {
+            'title': 'Empty page',
+            'version': {'number': 1},
             'body': {
                 'storage': {
                     'value': ''
@@ -41,38 +50,46 @@ class TestConfluenceLoader:
         result = get_page_content_by_id('999')
         assert result is None
 
-    @patch('app.confluence_loader.confluence')
-    def test_get_page_content_by_id_with_cleaning(self, mock_confluence):
-        """Тест загрузки с очисткой HTML"""
-        mock_confluence.get_page_by_id.return_value = {
+    @patch('app.page_cache.get_confluence')
+    def test_get_page_content_by_id_with_cleaning(self, mock_get_confluence):
+        """Тест загрузки с очисткой HTML: возвращается полный контент из кеша страниц"""
+        raw_html = '<p>Clean content</p><p style="color: red;">Colored content</p>'
+        mock_get_confluence.return_value.get_page_by_id.return_value = {
+            'title': 'Test page',
+            'version': {'number': 1},
             'body': {
                 'storage': {
-                    'value': '<p>Clean content</p><p style="color: red;">Colored content</p>'
+                    'value': raw_html
                 }
             }
         }
 
-        with patch('app.confluence_loader.filter_all_fragments') as mock_filter:
-            mock_filter.return_value = 'Filtered content'
+        with patch('app.page_cache.extract_all_and_approved_fragments') as mock_filter:
+            mock_filter.return_value = ('Filtered content', 'Approved content')
             result = get_page_content_by_id('123', clean_html=True)
 
         assert result == 'Filtered content'
-        mock_filter.assert_called_once()
+        mock_filter.assert_called_once_with(raw_html)
 
-    @patch('app.confluence_loader.get_page_title_by_id')
-    @patch('app.confluence_loader.get_page_content_by_id')
-    @patch('app.confluence_loader.extract_approved_fragments')
-    def test_load_pages_by_ids(self, mock_extract, mock_content, mock_title):
+    @patch('app.page_cache.prefetch_pages', return_value={})
+    @patch('app.page_cache.get_page_data_cached')
+    def test_load_pages_by_ids(self, mock_get_page_data, mock_prefetch):
         """Тест загрузки нескольких страниц"""
-        mock_title.side_effect = ['Page 1', 'Page 2']
-        mock_content.side_effect = [
-            '<p>Content 1</p>',
-            '<p>Content 2</p>'
-        ]
-        mock_extract.side_effect = [
-            'Approved 1',
-            'Approved 2'
-        ]
+        pages = {
+            '123': {
+                'title': 'Page 1',
+                'full_markdown': 'Content 1',
+                'approved_content': 'Approved 1',
+                'requirement_type': 'dataModel'
+            },
+            '456': {
+                'title': 'Page 2',
+                'full_markdown': 'Content 2',
+                'approved_content': 'Approved 2',
+                'requirement_type': 'process'
+            }
+        }
+        mock_get_page_data.side_effect = lambda page_id, page=None: pages[page_id]
 
         result = load_pages_by_ids(['123', '456'])
 
@@ -81,10 +98,28 @@ class TestConfluenceLoader:
         assert result[0]['title'] == 'Page 1'
         assert result[0]['approved_content'] == 'Approved 1'
         assert result[1]['id'] == '456'
+        mock_prefetch.assert_called_once_with(['123', '456'])
+
+    @patch('app.page_cache.prefetch_pages', return_value={})
+    @patch('app.page_cache.get_page_data_cached')
+    def test_load_pages_by_ids_duplicates_loaded_once(self, mock_get_page_data, mock_prefetch):
+        """Тест: повторяющиеся страницы загружаются один раз, порядок сохраняется"""
+        mock_get_page_data.side_effect = lambda page_id, page=None: {
+            'title': f'Page {page_id}',
+            'full_markdown': f'Content {page_id}',
+            'approved_content': f'Approved {page_id}',
+            'requirement_type': 'dataModel'
+        }
+
+        result = load_pages_by_ids(['123', '456', '123'])
+
+        assert [page['id'] for page in result] == ['123', '456', '123']
+        assert mock_get_page_data.call_count == 2
 
-    @patch('app.confluence_loader.confluence')
-    def test_get_child_page_ids(self, mock_confluence):
+    @patch('app.confluence_loader.get_confluence')
+    def test_get_child_page_ids(self, mock_get_confluence):
         """Тест получения дочерних страниц без рекурсии"""
+        mock_confluence = mock_get_confluence.return_value
 
         # ИСПРАВЛЕНИЕ: Настраиваем мок для предотвращения бесконечной рекурсии
         def mock_get_child_pages(page_id):
@@ -95,6 +130,8 @@ class TestConfluenceLoader:
                 return []
 
         mock_confluence.get_child_pages.side_effect = mock_get_child_pages
+        # CQL недоступен - используется обход дерева
+        mock_confluence.cql.side_effect = Exception("CQL is not supported")
 
         result = get_child_page_ids('parent123')
 
@@ -102,6 +139,78 @@ class TestConfluenceLoader:
         # Проверяем, что функция была вызвана для родительской и дочерних страниц
         assert mock_confluence.get_child_pages.call_count >= 1
 
+    @patch('app.confluence_loader.get_confluence')
+    def test_get_child_page_ids_traversal_by_levels(self, mock_get_confluence):
+        """Тест обхода дерева по уровням: результат в прямом порядке обхода в глубину, циклы пропускаются"""
+        mock_confluence = mock_get_confluence.return_value
+        tree = {
+            'parent123': [{'id': 'child1'}, {'id': 'child2'}],
+            'child1': [{'id': 'grandchild1'}],
+            'child2': [{'id': 'grandchild2'}, {'id': 'parent123'}],
+        }
+        mock_confluence.get_child_pages.side_effect = lambda page_id: tree.get(page_id, [])
+        mock_confluence.cql.side_effect = Exception("CQL is not supported")
+
+        result = get_child_page_ids('parent123')
+
+        assert result == ['child1', 'grandchild1', 'child2', 'grandchild2']
+
+    @patch('app.confluence_loader.time.sleep')
+    @patch('app.confluence_loader.get_confluence')
+    def test_get_child_page_ids_retries_paged_timeout(self, mock_get_confluence, mock_sleep):
+        """Тест: таймаут при переборе постраничной выдачи дочерних страниц повторяется"""
+        # Адаптер пула с Retry отдает таймаут чтения как ConnectionError (MaxRetryError)
+        from requests import ConnectionError
+        mock_confluence = mock_get_confluence.return_value
+        attempts = []
+
+        def paged_children(page_id):
+            if page_id != 'parent123':
+                return
+            attempts.append(page_id)
+            yield {'id': 'child1'}
+            if len(attempts) == 1:
+                raise ConnectionError("Max retries exceeded: read timeout on the second page of results")
+            yield {'id': 'child2'}
+
+        mock_confluence.get_child_pages.side_effect = paged_children
+        mock_confluence.cql.side_effect = Exception("CQL is not supported")
+
+        result = get_child_page_ids('parent123')
+
+        assert result == ['child1', 'child2']
+        assert len(attempts) == 2
+
+    @patch('app.confluence_loader.get_confluence')
+    def test_get_child_page_ids_cql_paginated(self, mock_get_confluence):
+        """Тест получения всех потомков постраничным CQL-поиском"""
+        mock_confluence = mock_get_confluence.return_value
+        mock_confluence.cql.side_effect = [
+            {'results': [{'content': {'id': 'child1'}}, {'content': {'id': 'child2'}}],
+             '_links': {'next': '/rest/api/search?start=2'}},
+            {'results': [{'content': {'id': 'grandchild1'}}], '_links': {}},
+        ]
+
+        result = get_child_page_ids('123')
+
+        assert result == ['child1', 'child2', 'grandchild1']
+        assert mock_confluence.cql.call_count == 2
+        assert mock_confluence.cql.call_args.args[0] == "ancestor = 123 and type = page"
+        assert mock_confluence.cql.call_args.kwargs['start'] == 2
+        mock_confluence.get_child_pages.assert_not_called()
+
+    @patch('app.confluence_loader.get_confluence')
+    def test_get_child_page_ids_non_numeric_id_skips_cql(self, mock_get_confluence):
+        """Тест: нечисловой идентификатор не подставляется в CQL, используется обход дерева"""
+        mock_confluence = mock_get_confluence.return_value
+        mock_confluence.get_child_pages.return_value = []
+
+        for page_id in ['1 or space = HR', '²']:
+            assert get_child_page_ids(page_id) == []
+
+        mock_confluence.cql.assert_not_called()
+        assert mock_confluence.get_child_pages.call_count == 2
+
     def test_extract_approved_fragments_basic(self):
         """Тест извлечения подтвержденных фрагментов"""
         html = '''
@@ -3,6 +3,7 @@
 import pytest
 from app.filter_approved_fragments import filter_approved_fragments
 from app.filter_all_fragments import filter_all_fragments
+from app.content_extractor import extract_all_and_approved_fragments
 
 
 class TestFilterFragments:
@@ -114,4 +115,32 @@ class TestFilterFragments:
 
         result = filter_approved_fragments(html)
         assert "Простой параграф" in result
-        assert "Простой div" in result
\ No newline at end of file
+        assert "Простой div" in result
+
+    def test_extract_all_and_approved_single_parse(self):
+        """Тест извлечения всех и подтвержденных фрагментов за один разбор"""
+        html = '''
+        <p>Подтвержденный текст</p>
+        <p style="color: red;">Красный текст</p>
+        <ac:structured-macro ac:name="expand">
+            <ac:rich-text-body><p>Текст в expand</p></ac:rich-text-body>
+        </ac:structured-macro>
+        '''
+
+        all_content, approved_content = extract_all_and_approved_fragments(html)
+        assert all_content == filter_all_fragments(html)
+        assert approved_content == filter_approved_fragments(html)
+        assert "Красный текст" in all_content
+        assert "Красный текст" not in approved_content
+        assert "Текст в expand" in approved_content
+
+    def test_extract_all_and_approved_without_colored_elements(self):
+        """Тест: без цветных элементов подтвержденный контент совпадает с полным"""
+        html = '''
+        <p style="color: rgb(0,0,0);">Черный текст со <a href="/pages/viewpage.action?pageId=1">ссылкой</a></p>
+        <ul><li>Пункт списка</li></ul>
+        '''
+
+        all_content, approved_content = extract_all_and_approved_fragments(html)
+        assert approved_content == all_content
+        assert approved_content == filter_approved_fragments(html)
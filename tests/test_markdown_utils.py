@@ -0,0 +1,37 @@
+# tests/test_markdown_utils.py
+
+from markdownify import markdownify
+
+from app.utils.markdown_utils import html_to_markdown, template_to_markdown
+
+
+class TestMarkdownUtils:
+
+    def test_html_to_markdown_matches_markdownify(self):
+        """Тест совпадения результата с markdownify"""
+        html = '''
+        <h1>Заголовок</h1>
+        <p>Текст с <strong>выделением</strong> и <a href="http://x">ссылкой</a></p>
+        <ul><li>Пункт 1<ul><li>Вложенный</li></ul></li></ul>
+        <table><tr><th>Поле</th><th>Тип</th></tr><tr><td>id</td><td>string</td></tr></table>
+        <pre><code>line 1
+
+line 2</code></pre>
+        '''
+
+        assert html_to_markdown(html) == markdownify(html, heading_style="ATX")
+
+    def test_html_to_markdown_headers_atx(self):
+        """Тест ATX-стиля заголовков"""
+        assert html_to_markdown("<h2>Раздел</h2>").strip() == "## Раздел"
+
+    def test_template_to_markdown_cached(self):
+        """Тест кеширования повторной конвертации того же шаблона"""
+        template_to_markdown.cache_clear()
+        html = "<p>Шаблон</p>"
+
+        first = template_to_markdown(html)
+        second = template_to_markdown(html)
+
+        assert first == second == html_to_markdown(html)
+        assert template_to_markdown.cache_info().hits == 1
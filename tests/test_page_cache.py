@@ -0,0 +1,139 @@
+# tests/test_page_cache.py
+
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+from app.page_cache import (get_page_data_cached, clear_page_cache, page_cache, processed_cache,
+                            prefetch_pages, _page_locks)
+
+
+class TestPageCache:
+
+    def setup_method(self):
+        clear_page_cache()
+
+    @patch('app.page_cache.analyze_text_template_type', return_value='dataModel')
+    @patch('app.page_cache.get_confluence')
+    def test_unchanged_version_reuses_processed_data(self, mock_get_confluence, mock_analyze):
+        """Тест: после истечения TTL неизменная версия страницы не обрабатывается повторно"""
+        mock_get_confluence.return_value.get_page_by_id.return_value = {
+            'title': 'Страница',
+            'version': {'number': 3},
+            'body': {'storage': {'value': '<p>Текст</p>'}}
+        }
+
+        first = get_page_data_cached('123')
+        page_cache.clear()  # имитация истечения TTL
+        second = get_page_data_cached('123')
+
+        assert second == first
+        assert mock_get_confluence.return_value.get_page_by_id.call_count == 2
+        assert mock_analyze.call_count == 1
+        # Обработанные данные хранятся без исходного HTML
+        assert 'raw_html' not in processed_cache[('123', 3)][1]
+
+    @patch('app.page_cache.analyze_text_template_type', return_value='dataModel')
+    @patch('app.page_cache.get_confluence')
+    def test_new_version_is_processed(self, mock_get_confluence, mock_analyze):
+        """Тест: новая версия страницы обрабатывается заново"""
+        get_page_by_id = mock_get_confluence.return_value.get_page_by_id
+        get_page_by_id.return_value = {
+            'title': 'Страница',
+            'version': {'number': 3},
+            'body': {'storage': {'value': '<p>Старый текст</p>'}}
+        }
+        get_page_data_cached('123')
+        page_cache.clear()
+
+        get_page_by_id.return_value = {
+            'title': 'Страница',
+            'version': {'number': 4},
+            'body': {'storage': {'value': '<p>Новый текст</p>'}}
+        }
+        result = get_page_data_cached('123')
+
+        assert "Новый текст" in result['full_content']
+        assert mock_analyze.call_count == 2
+
+    @patch('app.page_cache.analyze_text_template_type', return_value='dataModel')
+    @patch('app.page_cache.get_confluence')
+    def test_prefetch_pages_batch_with_fallback(self, mock_get_confluence, mock_analyze):
+        """Тест: страницы запрашиваются одним CQL-запросом, пропущенные - по одной"""
+        confluence = mock_get_confluence.return_value
+        confluence.cql.return_value = {'results': [
+            {'content': {'id': '1', 'title': 'Первая', 'version': {'number': 1},
+                         'body': {'storage': {'value': '<p>Один</p>'}}}},
+            {'content': {'id': '2', 'title': 'Вторая', 'version': {'number': 1},
+                         'body': {'storage': {'value': '<p>Два</p>'}}}},
+        ]}
+        confluence.get_page_by_id.return_value = {
+            'title': 'Третья',
+            'version': {'number': 1},
+            'body': {'storage': {'value': '<p>Три</p>'}}
+        }
+
+        prefetched = prefetch_pages(['1', '2', '3'])
+        results = [get_page_data_cached(page_id, prefetched.get(page_id)) for page_id in ['1', '2', '3']]
+
+        assert confluence.cql.call_count == 1
+        assert confluence.cql.call_args.args[0] == "id in (1,2,3)"
+        assert [result['title'] for result in results] == ['Первая', 'Вторая', 'Третья']
+        confluence.get_page_by_id.assert_called_once_with('3', expand='body.storage,version')
+
+    @patch('app.page_cache.get_confluence')
+    def test_prefetch_pages_skips_non_ascii_digit_ids(self, mock_get_confluence):
+        """Тест: цифры Unicode вне ASCII не подставляются в CQL-запрос"""
+        confluence = mock_get_confluence.return_value
+        confluence.cql.return_value = {'results': []}
+
+        prefetch_pages(['1', '²', '٣', '2'])
+
+        assert confluence.cql.call_args.args[0] == "id in (1,2)"
+
+    @patch('app.page_cache.analyze_text_template_type', return_value='dataModel')
+    @patch('app.page_cache.get_confluence')
+    def test_concurrent_requests_load_page_once(self, mock_get_confluence, mock_analyze):
+        """Тест: одновременные запросы одной страницы выполняют одну загрузку, блокировка затем удаляется"""
+        release = threading.Event()
+
+        def slow_get_page_by_id(page_id, expand=None):
+            release.wait(5)
+            return {
+                'title': 'Страница',
+                'version': {'number': 1},
+                'body': {'storage': {'value': '<p>Текст</p>'}}
+            }
+
+        mock_get_confluence.return_value.get_page_by_id.side_effect = slow_get_page_by_id
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_page_data_cached('123')))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 3
+        assert all(result is results[0] for result in results)
+        assert mock_get_confluence.return_value.get_page_by_id.call_count == 1
+        assert not _page_locks
+
+    @patch('app.page_cache.PAGE_PROCESSING_WORKERS', 1)
+    @patch('app.page_cache._get_processing_pool')
+    @patch('app.page_cache.analyze_text_template_type', return_value='dataModel')
+    @patch('app.page_cache.get_confluence')
+    def test_broken_processing_pool_is_reset(self, mock_get_confluence, mock_analyze, mock_get_pool):
+        """Тест: сломанный пул процессов сбрасывается, страница обрабатывается в текущем потоке"""
+        mock_get_confluence.return_value.get_page_by_id.return_value = {
+            'title': 'Страница',
+            'version': {'number': 1},
+            'body': {'storage': {'value': '<p>Текст</p>'}}
+        }
+        mock_get_pool.return_value.submit.side_effect = BrokenProcessPool("worker died")
+
+        result = get_page_data_cached('123')
+
+        assert "Текст" in result['full_content']
+        mock_get_pool.cache_clear.assert_called_once()
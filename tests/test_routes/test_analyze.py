@@ -1,5 +1,6 @@
 # tests/test_routes/test_analyze.py
 
+import json
 import pytest
 from unittest.mock import patch
 
@@ -57,4 +58,25 @@ class TestAnalyzeRoutes:
         assert response.status_code == 200
         data = response.json()
         assert len(data["results"]) == 1
-        assert data["results"][0]["requirement_type"] == "process"
\ No newline at end of file
+        assert data["results"][0]["requirement_type"] == "process"
+
+    @patch('app.routes.analyze.iter_analyze_with_templates')
+    def test_analyze_with_templates_stream_success(self, mock_iter_analyze, app_client):
+        """Тест потокового анализа с шаблонами (NDJSON)"""
+        mock_iter_analyze.return_value = iter([
+            {"page_id": "123", "requirement_type": "process"},
+            {"page_id": "456", "requirement_type": "dataModel"}
+        ])
+
+        response = app_client.post("/analyze_with_templates/stream", json={
+            "items": [
+                {"requirement_type": "process", "page_id": "123"},
+                {"requirement_type": "dataModel", "page_id": "456"}
+            ],
+            "service_code": "CC"
+        })
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["page_id"] for line in lines] == ["123", "456"]
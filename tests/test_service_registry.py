@@ -0,0 +1,32 @@
+# tests/test_service_registry.py
+
+from unittest.mock import patch
+
+from app.service_registry import get_service_by_code, is_valid_service, reload_services
+
+
+class TestServiceRegistry:
+
+    def setup_method(self):
+        reload_services()
+
+    def teardown_method(self):
+        reload_services()
+
+    def test_duplicate_code_returns_first_entry(self):
+        """Тест: при повторе кода в services.json возвращается первая запись"""
+        services = [
+            {'code': 'DSF', 'key': 'DS', 'platform': False},
+            {'code': 'DSF', 'key': 'DF', 'platform': False},
+        ]
+        with patch('app.service_registry.json.load', return_value=services):
+            assert get_service_by_code('DSF')['key'] == 'DS'
+
+    def test_reload_services_rereads_file(self):
+        """Тест: после reload_services реестр читается заново"""
+        with patch('app.service_registry.json.load', return_value=[{'code': 'OLD'}]):
+            assert is_valid_service('OLD')
+        with patch('app.service_registry.json.load', return_value=[{'code': 'NEW'}]):
+            assert not is_valid_service('NEW')
+            reload_services()
+            assert is_valid_service('NEW')
@@ -190,10 +190,26 @@ class TestTableHeaderOrderFix:
 
         print(" Complex table order verified!")
 
+    def test_nested_table_thead_before_tbody(self):
+        """Тест: во вложенной таблице строки thead выводятся перед строками tbody"""
+        html = '''
+        <table><tbody><tr><td>
+            <table>
+                <thead><tr><th>Вл_Заг</th></tr></thead>
+                <tbody><tr><td>Вл_Знач</td></tr></tbody>
+            </table>
+        </td></tr></tbody></table>
+        '''
+
+        result = filter_all_fragments(html)
+
+        assert "<tr><th>Вл_Заг</th></tr><tr><td>Вл_Знач</td></tr>" in result
+
 
 if __name__ == "__main__":
     test = TestTableHeaderOrderFix()
     test.test_table_with_thead_tbody_order()
     test.test_table_without_explicit_thead_tbody()
     test.test_complex_table_with_colored_content()
+    test.test_nested_table_thead_before_tbody()
     print(" All table header order fix tests passed!")
\ No newline at end of file